@@ -0,0 +1,154 @@
+"""
+async_db.py – Non-blocking asyncio facade over database.py
+Reads run on a small thread pool, every write goes through a single writer
+thread, so a slow commit never stalls the event loop or unrelated readers.
+Long maintenance jobs get their own thread so they don't queue up the writer;
+their short transactions interleave with the writer's through busy_timeout.
+
+Usage inside handlers:
+    import async_db as db
+    user = await db.get_user(user_id)
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+READ_WORKERS = 4
+
+# Each worker thread keeps its own pooled connection (see database._conn)
+_readers = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="db-read")
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+_maintenance = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-maintenance")
+
+def _run_on(executor, fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+    return wrapper
+
+def _read(fn):
+    return _run_on(_readers, fn)
+
+def _write(fn):
+    return _run_on(_writer, fn)
+
+def _background(fn):
+    return _run_on(_maintenance, fn)
+
+async def shutdown():
+    """Drains the writer, flushes queued counters and any pending snapshot, stops every pool."""
+    await flush_counters()
+    await flush_backup()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _maintenance.shutdown)
+    await loop.run_in_executor(None, _writer.shutdown)
+    await loop.run_in_executor(None, _readers.shutdown)
+
+# ── Characters ─────────────────────────────────────────────────────────────
+add_character          = _write(database.add_character)
+add_characters         = _write(database.add_characters)
+get_character          = _read(database.get_character)
+get_all_characters     = _read(database.get_all_characters)
+get_characters_by_rarity = _read(database.get_characters_by_rarity)
+pick_spawn_character   = _read(database.pick_spawn_character)
+update_character       = _write(database.update_character)
+delete_character       = _write(database.delete_character)
+search_characters      = _read(database.search_characters)
+
+# ── Users ──────────────────────────────────────────────────────────────────
+ensure_user            = _write(database.ensure_user)
+ensure_users           = _write(database.ensure_users)
+user_write_metrics     = _read(database.user_write_metrics)
+get_user               = _read(database.get_user)
+update_coins           = _write(database.update_coins)
+increment_catches      = _write(database.increment_catches)
+set_last_daily         = _write(database.set_last_daily)
+claim_daily            = _write(database.claim_daily)
+start_duel_cooldown    = _write(database.start_duel_cooldown)
+set_milestone_level    = _write(database.set_milestone_level)
+add_win                = _write(database.add_win)
+add_loss               = _write(database.add_loss)
+ban_user               = _write(database.ban_user)
+unban_user             = _write(database.unban_user)
+is_banned              = _read(database.is_banned)
+get_leaderboard        = _read(database.get_leaderboard)
+get_leaderboard_page   = _read(database.get_leaderboard_page)
+get_user_rank          = _read(database.get_user_rank)
+snapshot_weekly_leaderboard = _background(database.snapshot_weekly_leaderboard)
+get_weekly_leaderboard = _read(database.get_weekly_leaderboard)
+get_all_user_ids       = _read(database.get_all_user_ids)
+get_user_ids_after     = _read(database.get_user_ids_after)
+
+async def queue_counters(user_id, coins=0, catches=0, wins=0, losses=0):
+    """Group-committed counter update; resolves once the delta is durable."""
+    return await asyncio.wrap_future(database.queue_counters(user_id, coins, catches, wins, losses))
+
+# ── Collections ─────────────────────────────────────────────────────────────
+add_to_collection      = _write(database.add_to_collection)
+get_collection         = _read(database.get_collection)
+get_collection_page    = _read(database.get_collection_page)
+get_full_collection    = _read(database.get_full_collection)
+count_collection       = _read(database.count_collection)
+count_copies           = _read(database.count_copies)
+has_character          = _read(database.has_character)
+remove_from_collection = _write(database.remove_from_collection)
+burn_duplicates        = _write(database.burn_duplicates)
+
+# ── Active Spawns ──────────────────────────────────────────────────────────
+set_spawn              = _write(database.set_spawn)
+get_spawn              = _read(database.get_spawn)
+mark_caught            = _write(database.mark_caught)
+clear_spawn            = _write(database.clear_spawn)
+clear_spawns           = _write(database.clear_spawns)
+get_active_spawns      = _read(database.get_active_spawns)
+
+# ── Catching ──────────────────────────────────────────────────────────────
+catch_character        = _write(database.catch_character)
+
+# ── Redeem Codes ──────────────────────────────────────────────────────────
+create_redeem_code     = _write(database.create_redeem_code)
+generate_redeem_codes  = _write(database.generate_redeem_codes)
+get_redeem_code        = _read(database.get_redeem_code)
+redeem_code            = _write(database.redeem_code)
+
+# ── Trades ────────────────────────────────────────────────────────────────
+create_trade           = _write(database.create_trade)
+get_trade              = _read(database.get_trade)
+accept_trade           = _write(database.accept_trade)
+decline_trade          = _write(database.decline_trade)
+update_trade_status    = _write(database.update_trade_status)
+expire_trades          = _write(database.expire_trades)
+
+# ── Broadcasts ────────────────────────────────────────────────────────────
+create_broadcast       = _write(database.create_broadcast)
+get_broadcast          = _read(database.get_broadcast)
+get_unfinished_broadcast = _read(database.get_unfinished_broadcast)
+checkpoint_broadcast   = _write(database.checkpoint_broadcast)
+finish_broadcast       = _write(database.finish_broadcast)
+
+# ── Stats & Maintenance ───────────────────────────────────────────────────
+get_stats              = _read(database.get_stats)
+get_daily_stats        = _read(database.get_daily_stats)
+backup_metrics         = _read(database.backup_metrics)
+character_cache_metrics = _read(database.character_cache_metrics)
+flush_backup           = _background(database.flush_backup)
+export_ndjson          = _read(database.export_ndjson)
+import_ndjson          = _write(database.import_ndjson)
+counter_metrics        = _read(database.counter_metrics)
+flush_counters         = _write(database.flush_counters)
+
+# ── Jobs ──────────────────────────────────────────────────────────────────
+async def leaderboard_snapshot_job(context):
+    """
+    python-telegram-bot job callback, e.g.
+    app.job_queue.run_daily(leaderboard_snapshot_job, time=..., days=(6,))
+    """
+    await snapshot_weekly_leaderboard()
+
+async def trade_expiry_job(context):
+    """python-telegram-bot job callback, e.g. app.job_queue.run_repeating(trade_expiry_job, interval=300)."""
+    await expire_trades()
@@ -0,0 +1,61 @@
+"""
+Per-call latency of database.py functions with the pooled per-thread
+connection versus the old connect-per-call _conn() (new sqlite3 connection,
+makedirs and the WAL/foreign_keys PRAGMAs on every call).
+
+    python benchmarks/bench_connections.py [calls]      # default 2,000 per function
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+os.environ["WAIFUBOT_DATA_DIR"] = tempfile.mkdtemp(prefix="waifubot-bench-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+def _unpooled_conn():
+    """database._conn() as it was before the pool."""
+    os.makedirs(database.DATA_DIR, exist_ok=True)
+    con = sqlite3.connect(database.DB_PATH)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA foreign_keys=ON")
+    return con
+
+CALLS = {
+    "get_user":       lambda i: database.get_user(1 + i % 100),
+    "update_coins":   lambda i: database.update_coins(1 + i % 100, 1),
+    "get_collection": lambda i: database.get_collection(1 + i % 100),
+}
+
+def per_call_us(fn, calls):
+    fn(0)   # warm up (opens the pooled connection, fills the statement cache)
+    started = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+def run(calls):
+    database.ensure_users([(i, f"user{i}", f"User {i}") for i in range(1, 101)])
+
+    pooled_conn = database._conn
+    results = {}
+    for label, conn in (("connect per call", _unpooled_conn), ("pooled", pooled_conn)):
+        database._conn = conn
+        try:
+            for name, fn in CALLS.items():
+                results.setdefault(name, {})[label] = per_call_us(fn, calls)
+        finally:
+            database._conn = pooled_conn
+
+    print(f"{'function':<16}{'connect per call':>18}{'pooled':>12}{'speedup':>10}")
+    for name, timings in results.items():
+        before, after = timings["connect per call"], timings["pooled"]
+        print(f"{name:<16}{before:>15.1f}us{after:>10.1f}us{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
@@ -0,0 +1,60 @@
+"""
+Cost of choosing a spawn: pick_spawn_character() (alias table over
+RARITY_WEIGHTS, then a cached rarity bucket) against the old approach of
+loading the roster and filtering it per spawn, both from the table
+(get_all_characters() before the character cache) and from the cached list.
+
+    python benchmarks/bench_spawn_sampler.py [characters] [picks]    # default 5,000 characters, 20,000 picks
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ["WAIFUBOT_DATA_DIR"] = tempfile.mkdtemp(prefix="waifubot-bench-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import database
+
+def seed(characters, rng):
+    rarities = list(config.RARITY_WEIGHTS)
+    weights = list(config.RARITY_WEIGHTS.values())
+    database.add_characters([
+        (f"Character {i}", f"Anime {i % 300}", rng.choices(rarities, weights)[0], f"https://example.com/{i}.png", 1)
+        for i in range(characters)
+    ])
+
+def filter_pick(roster, rng):
+    """Weighted rarity, then a uniform choice among the roster rows of that rarity."""
+    rarity = rng.choices(list(config.RARITY_WEIGHTS), list(config.RARITY_WEIGHTS.values()))[0]
+    matching = [r for r in roster if r["rarity"] == rarity and not r["is_custom"]]
+    return rng.choice(matching) if matching else None
+
+def per_pick_us(pick, picks):
+    pick()      # warm up (loads the character cache, builds the sampler)
+    started = time.perf_counter()
+    for _ in range(picks):
+        pick()
+    return (time.perf_counter() - started) / picks * 1e6
+
+def run(characters, picks):
+    rng = random.Random(1)
+    seed(characters, rng)
+    results = {
+        "pick_spawn_character()":         per_pick_us(lambda: database.pick_spawn_character(rng), picks),
+        "cached roster + filter":         per_pick_us(lambda: filter_pick(database.get_all_characters(), rng), picks),
+        # A full table read per spawn is slow; fewer picks keep the run short
+        "SELECT * FROM characters + filter": per_pick_us(lambda: filter_pick(database._fetch_all_characters(), rng),
+                                                         max(picks // 100, 20)),
+    }
+    fastest = results["pick_spawn_character()"]
+    print(f"{characters:,} characters, {picks:,} picks")
+    for label, us in results.items():
+        print(f"{label:<36}{us:>12.2f}us/pick{us / fastest:>10.0f}x")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20_000)
@@ -0,0 +1,78 @@
+"""
+SpawnScheduler under synthetic group chatter: thousands of groups (a few
+busy, most quiet), messages from a pool of users, a simulated clock so
+cooldowns and catch windows play out, and ensure_users() flushed every
+USER_FLUSH_SEC of simulated time the way flush_users_job does.
+
+    python benchmarks/bench_spawn_scheduler.py [groups] [messages]    # default 5,000 groups, 1,000,000 messages
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ["WAIFUBOT_DATA_DIR"] = tempfile.mkdtemp(prefix="waifubot-bench-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import database
+from spawns import SpawnRegistry, SpawnScheduler
+
+MESSAGES_PER_SEC = 500      # simulated chat rate across all groups
+USERS = 50_000
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+def stream(groups, messages, rng):
+    """(group_id, user_id) pairs; group activity is Zipf-like so a few groups are very busy."""
+    weights = [1 / rank for rank in range(1, groups + 1)]
+    group_ids = rng.choices(range(-groups, 0), weights=weights, k=messages)
+    user_ids = [rng.randrange(1, USERS + 1) for _ in range(messages)]
+    return list(zip(group_ids, user_ids))
+
+def run_scenario(label, events, cooldown, catch_window):
+    clock = Clock()
+    registry = SpawnRegistry(catch_window=catch_window, cooldown=cooldown, clock=clock)
+    scheduler = SpawnScheduler(registry, rng=random.Random(42))
+    step = 1 / MESSAGES_PER_SEC
+    next_flush = clock.now + config.USER_FLUSH_SEC
+    flushes, flushed_users, flush_time, scheduler_time = 0, 0, 0.0, 0.0
+
+    for group_id, user_id in events:
+        clock.now += step
+        started = time.perf_counter()
+        if scheduler.on_message(group_id, user_id, f"user{user_id}", "User"):
+            registry.add(group_id, 1, 0)
+        scheduler_time += time.perf_counter() - started
+        if clock.now >= next_flush:
+            registry.expire_due()
+            started = time.perf_counter()
+            flushed_users += database.ensure_users(scheduler.take_pending_users())
+            flush_time += time.perf_counter() - started
+            flushes += 1
+            next_flush += config.USER_FLUSH_SEC
+
+    messages = scheduler.messages
+    print(f"{label}: {messages:,} messages, {scheduler.spawns:,} spawns "
+          f"(rate {scheduler.spawns / messages:.4f}, SPAWN_CHANCE {config.SPAWN_CHANCE})")
+    print(f"  on_message: {scheduler_time / messages * 1e6:.2f}us/msg, {messages / scheduler_time:,.0f} msg/s")
+    print(f"  ensure_users: {flushes} flushes of {flushed_users // max(flushes, 1):,} users, "
+          f"{flush_time / max(flushes, 1) * 1000:.1f}ms each, "
+          f"{flushes + scheduler.spawns:,} DB writes instead of {messages:,}")
+
+def run(groups, messages):
+    events = stream(groups, messages, random.Random(1))
+    print(f"{groups:,} groups, {USERS:,} users, {MESSAGES_PER_SEC} msg/s simulated")
+    run_scenario("no cooldown", events, cooldown=0, catch_window=0)
+    run_scenario("default cooldowns", events, cooldown=config.SPAWN_COOLDOWN_SEC, catch_window=config.CATCH_WINDOW_SEC)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000)
@@ -0,0 +1,62 @@
+"""
+Weekly leaderboard snapshot at scale: how long snapshot_weekly_leaderboard()
+takes for N players, and how long bot writes going through async_db (the
+same path handlers use) are held up while the job runs.
+
+    python benchmarks/bench_weekly_snapshot.py [users]      # default 1,000,000
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ["WAIFUBOT_DATA_DIR"] = tempfile.mkdtemp(prefix="waifubot-bench-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import async_db
+
+def seed(users):
+    con = database._conn()
+    with con:
+        con.executemany(
+            "INSERT INTO users (user_id, catches, coins) VALUES (?, ?, ?)",
+            ((i, (i * 7919) % 5000, 0) for i in range(1, users + 1)),
+        )
+
+async def run(users):
+    seed(users)
+    await async_db.snapshot_weekly_leaderboard("2024-W01")
+    with database._conn() as con:
+        con.execute("UPDATE users SET catches = catches + (user_id % 13)")
+
+    latencies, errors = [], []
+
+    async def writer(job):
+        while not job.done():
+            started = time.perf_counter()
+            try:
+                await async_db.update_coins(1, 1)
+            except Exception as e:
+                errors.append(repr(e))
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    job = asyncio.ensure_future(async_db.snapshot_weekly_leaderboard("2024-W02"))
+    await writer(job)
+    written = await job
+    elapsed = time.perf_counter() - started
+    await async_db.shutdown()
+
+    latencies.sort()
+    print(f"users={users:,} rows={written:,} snapshot={elapsed:.2f}s")
+    print(f"async_db.update_coins during the job: {len(latencies)} calls, "
+          f"p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms "
+          f"max={latencies[-1] * 1000:.1f}ms, errors={len(errors)}")
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
@@ -0,0 +1,203 @@
+"""
+broadcast.py – Rate-limited announcement fan-out for WaifuBot
+User ids are streamed from the users table in primary-key chunks, every
+send waits on a global token bucket plus a per-chat interval, 429 replies
+pause the whole limiter for retry_after, and progress is checkpointed in
+the broadcasts table after each chunk so a restart resumes where it stopped.
+
+    import broadcast
+    stats = await broadcast.start(context.bot, text)           # /broadcast
+    await broadcast.resume(application.bot)                     # post_init
+
+Any telegram.Bot works, including one pointed at a local fake Bot API. A
+standalone Bot has a single HTTP connection, so give it a bigger pool:
+    Bot(token, base_url="http://127.0.0.1:8081/bot",
+        request=HTTPXRequest(connection_pool_size=32))
+"""
+
+import asyncio
+import logging
+import time
+
+from telegram.error import Forbidden, BadRequest, NetworkError, RetryAfter, TelegramError
+
+import config
+import async_db
+
+logger = logging.getLogger(__name__)
+
+# ── Rate Limiting ─────────────────────────────────────────────────────────
+class TokenBucket:
+    """
+    `rate` tokens per second, bursts up to `capacity`. Waiters are served
+    in arrival order, so hundreds of pending sends don't all wake up and
+    race for the same token.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds):
+        """Holds every waiter for `seconds` (a 429 is a bot-wide limit) and drains the burst."""
+        now = self.clock()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._refill(now)
+        self._tokens = 0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = self.clock()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class RateLimiter:
+    """Global token bucket plus a minimum interval between messages to one chat."""
+
+    def __init__(self, rate=config.BROADCAST_RATE, chat_interval=config.BROADCAST_CHAT_INTERVAL, clock=time.monotonic):
+        self.bucket = TokenBucket(rate, clock=clock)
+        self.chat_interval = chat_interval
+        self.clock = clock
+        self._chat_next = {}        # chat_id -> earliest time of the next send
+
+    async def acquire(self, chat_id):
+        wait = self._chat_next.get(chat_id, 0) - self.clock()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await self.bucket.acquire()
+        self._chat_next[chat_id] = self.clock() + self.chat_interval
+
+    def pause(self, seconds):
+        self.bucket.pause(seconds)
+
+    def prune(self):
+        """Forgets chats whose interval has passed; called between chunks."""
+        now = self.clock()
+        for chat_id in [c for c, t in self._chat_next.items() if t <= now]:
+            del self._chat_next[chat_id]
+
+def _seconds(retry_after):
+    # RetryAfter.retry_after is an int in older python-telegram-bot releases, a timedelta in newer ones
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+# ── Fan-out ───────────────────────────────────────────────────────────────
+class Broadcast:
+    """
+    One announcement being delivered. Each chunk of user ids is sent
+    concurrently (the limiter sets the pace) and checkpointed once every
+    send in it has finished, so a crash re-sends at most one chunk.
+    """
+
+    def __init__(self, bot, broadcast_id, text, after=0, limiter=None,
+                 chunk_size=config.BROADCAST_CHUNK, max_retries=config.BROADCAST_MAX_RETRIES,
+                 max_rate_limits=config.BROADCAST_MAX_RATE_LIMITS, on_progress=None):
+        self.bot = bot
+        self.id = broadcast_id
+        self.text = text
+        self.after = after
+        self.limiter = limiter or RateLimiter()
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.max_rate_limits = max_rate_limits
+        self.on_progress = on_progress
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.started = None
+        self.elapsed = 0.0
+
+    async def _send(self, chat_id):
+        """
+        True if delivered, False if the chat can't be reached (blocked bot, deleted account...).
+        A 429 just waits and tries again; it doesn't use up the network-error attempts,
+        only the separate max_rate_limits allowance.
+        """
+        attempt = rate_limited = 0
+        while True:
+            await self.limiter.acquire(chat_id)
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=self.text)
+                return True
+            except RetryAfter as e:
+                self.retries += 1
+                rate_limited += 1
+                if rate_limited > self.max_rate_limits:
+                    logger.warning(f"Broadcast {self.id} to {chat_id} failed: still rate limited after {rate_limited} tries")
+                    return False
+                self.limiter.pause(_seconds(e.retry_after))
+            except (Forbidden, BadRequest):
+                return False
+            except NetworkError as e:
+                self.retries += 1
+                attempt += 1
+                if attempt >= self.max_retries:
+                    logger.warning(f"Broadcast {self.id} to {chat_id} failed: {e}")
+                    return False
+                await asyncio.sleep(2 ** attempt)
+            except TelegramError as e:
+                logger.warning(f"Broadcast {self.id} to {chat_id} failed: {e}")
+                return False
+
+    def metrics(self):
+        elapsed = self.elapsed or (time.monotonic() - self.started if self.started else 0.0)
+        return {
+            "id": self.id,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "last_user_id": self.after,
+            "elapsed": round(elapsed, 2),
+            "per_sec": round(self.sent / elapsed, 1) if elapsed else 0.0,
+        }
+
+    async def run(self):
+        self.started = time.monotonic()
+        while True:
+            ids = await async_db.get_user_ids_after(self.after, self.chunk_size)
+            if not ids:
+                break
+            results = await asyncio.gather(*(self._send(chat_id) for chat_id in ids))
+            sent = sum(results)
+            failed = len(results) - sent
+            self.after = ids[-1]
+            self.sent += sent
+            self.failed += failed
+            await async_db.checkpoint_broadcast(self.id, self.after, sent, failed)
+            self.limiter.prune()
+            stats = self.metrics()
+            logger.info(f"Broadcast {self.id}: {stats['sent']} sent, {stats['failed']} failed, {stats['per_sec']} msg/s")
+            if self.on_progress:
+                await self.on_progress(stats)
+        self.elapsed = time.monotonic() - self.started
+        await async_db.finish_broadcast(self.id)
+        return self.metrics()
+
+# ── Entry Points ──────────────────────────────────────────────────────────
+async def start(bot, text, on_progress=None, **kwargs):
+    """Records a new broadcast and delivers it to every non-banned user; returns its metrics."""
+    broadcast_id = await async_db.create_broadcast(text)
+    return await Broadcast(bot, broadcast_id, text, on_progress=on_progress, **kwargs).run()
+
+async def resume(bot, **kwargs):
+    """Finishes a broadcast interrupted by a restart, if any; returns its metrics or None."""
+    row = await async_db.get_unfinished_broadcast()
+    if row is None:
+        return None
+    logger.info(f"Resuming broadcast {row['id']} after user {row['last_user_id']}")
+    return await Broadcast(bot, row["id"], row["text"], after=row["last_user_id"], **kwargs).run()
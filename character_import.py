@@ -0,0 +1,190 @@
+"""
+character_import.py – Bulk character import for WaifuBot
+Streams a roster from CSV (header: name,anime,rarity,image_url) or JSON
+Lines, validates each row, checks every image_url concurrently through a
+bounded aiohttp pool, and inserts the good rows IMPORT_BATCH_SIZE at a time,
+one transaction per batch. Rejected rows go to a CSV error report.
+
+    python character_import.py roster.csv --report errors.csv
+    python character_import.py roster.jsonl --no-check --added-by 1214273889
+
+Rarity may be given exactly ("💫 Rare") or by name alone ("rare").
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+
+import config
+import async_db
+
+FIELDS = ("name", "anime", "rarity", "image_url")
+
+# "rare" -> "💫 Rare"; the exact keys map to themselves
+_RARITIES = {**{r: r for r in config.RARITY_WEIGHTS},
+             **{r.split(" ", 1)[-1].lower(): r for r in config.RARITY_WEIGHTS}}
+
+# ── Input ─────────────────────────────────────────────────────────────────
+def read_rows(path):
+    """Yields (line number, dict) from a .csv, .jsonl/.ndjson or .json roster without loading it whole (except .json)."""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+    elif path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_no, {"_error": f"invalid JSON: {e.msg}"}
+    elif path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            yield from enumerate(json.load(f), start=1)
+    else:
+        raise ValueError(f"{path}: expected .csv, .jsonl, .ndjson or .json")
+
+def validate(row):
+    """Returns (clean row, None) or (None, error message)."""
+    if not isinstance(row, dict):
+        return None, "row is not an object"
+    if "_error" in row:
+        return None, row["_error"]
+    clean = {field: str(row.get(field) or "").strip() for field in FIELDS}
+    for field in ("name", "anime", "image_url"):
+        if not clean[field]:
+            return None, f"{field} is missing"
+    rarity = _RARITIES.get(clean["rarity"]) or _RARITIES.get(clean["rarity"].lower())
+    if rarity is None:
+        return None, f"unknown rarity {clean['rarity']!r} (expected one of: {', '.join(config.RARITY_WEIGHTS)})"
+    clean["rarity"] = rarity
+    url = urlparse(clean["image_url"])
+    if url.scheme not in ("http", "https") or not url.netloc:
+        return None, f"image_url is not an http(s) URL: {clean['image_url']!r}"
+    return clean, None
+
+# ── Image URL Checks ──────────────────────────────────────────────────────
+async def check_url(session, url):
+    """None if url serves an image, otherwise why not. Falls back to GET for servers that refuse HEAD."""
+    try:
+        async with session.head(url, allow_redirects=True) as resp:
+            status, kind = resp.status, resp.content_type
+        if status in (403, 405, 501):
+            async with session.get(url, allow_redirects=True) as resp:
+                status, kind = resp.status, resp.content_type
+    except asyncio.TimeoutError:
+        return "image_url timed out"
+    except aiohttp.ClientError as e:
+        return f"image_url unreachable: {e.__class__.__name__}"
+    if status >= 400:
+        return f"image_url returned HTTP {status}"
+    if kind and not kind.startswith("image/") and kind != "application/octet-stream":
+        return f"image_url is {kind}, not an image"
+    return None
+
+async def check_urls(session, urls, concurrency):
+    """
+    {url: error or None} for a batch, at most `concurrency` checks in flight.
+    The semaphore (not just the connector limit) keeps queued checks from
+    eating into their own timeout.
+    """
+    unique = list(dict.fromkeys(urls))
+    gate = asyncio.Semaphore(concurrency)
+
+    async def bounded(url):
+        async with gate:
+            return await check_url(session, url)
+
+    results = await asyncio.gather(*(bounded(url) for url in unique))
+    return dict(zip(unique, results))
+
+# ── Import ────────────────────────────────────────────────────────────────
+class _Report:
+    """Per-row error report, written as rows are rejected."""
+
+    def __init__(self, path):
+        self._file = open(path, "w", newline="", encoding="utf-8") if path else None
+        self._writer = csv.writer(self._file) if self._file else None
+        if self._writer:
+            self._writer.writerow(("line", "name", "error"))
+        self.errors = 0
+
+    def add(self, line_no, row, error):
+        self.errors += 1
+        if self._writer:
+            name = row.get("name", "") if isinstance(row, dict) else ""
+            self._writer.writerow((line_no, name, error))
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+async def import_characters(path, added_by=0, report_path=None, check_images=True,
+                            batch_size=config.IMPORT_BATCH_SIZE,
+                            concurrency=config.IMPORT_URL_CONCURRENCY, timeout=config.IMPORT_URL_TIMEOUT):
+    """Imports a roster file; returns {"rows", "imported", "errors", "elapsed"}."""
+    started = time.perf_counter()
+    report = _Report(report_path)
+    rows = imported = 0
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout))
+    try:
+        async def flush(batch):
+            if check_images:
+                errors = await check_urls(session, [clean["image_url"] for _, _, clean in batch], concurrency)
+                good = []
+                for line_no, row, clean in batch:
+                    if errors[clean["image_url"]]:
+                        report.add(line_no, row, errors[clean["image_url"]])
+                    else:
+                        good.append(clean)
+            else:
+                good = [clean for _, _, clean in batch]
+            ids = await async_db.add_characters(
+                [(c["name"], c["anime"], c["rarity"], c["image_url"], added_by) for c in good]
+            )
+            return len(ids)
+
+        batch = []
+        for line_no, row in read_rows(path):
+            rows += 1
+            clean, error = validate(row)
+            if error:
+                report.add(line_no, row, error)
+                continue
+            batch.append((line_no, row, clean))
+            if len(batch) >= batch_size:
+                imported += await flush(batch)
+                batch = []
+        if batch:
+            imported += await flush(batch)
+    finally:
+        await session.close()
+        report.close()
+    return {"rows": rows, "imported": imported, "errors": report.errors,
+            "elapsed": round(time.perf_counter() - started, 2)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import characters from CSV or JSON.")
+    parser.add_argument("path", help="roster file (.csv, .jsonl, .ndjson or .json)")
+    parser.add_argument("--report", help="write rejected rows to this CSV")
+    parser.add_argument("--added-by", type=int, default=0, help="Telegram id recorded as added_by")
+    parser.add_argument("--no-check", action="store_true", help="skip the image_url reachability check")
+    args = parser.parse_args()
+
+    async def main():
+        result = await import_characters(args.path, added_by=args.added_by,
+                                         report_path=args.report, check_images=not args.no_check)
+        await async_db.shutdown()
+        return result
+
+    result = asyncio.run(main())
+    print(f"✅ Imported {result['imported']} of {result['rows']} rows in {result['elapsed']}s, "
+          f"{result['errors']} rejected" + (f" (see {args.report})" if args.report and result["errors"] else ""))
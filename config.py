@@ -8,11 +8,18 @@ ADMIN_IDS = [1214273889]             # 👈 Replace with your Telegram user ID(s
 SPAWN_CHANCE          = 0.05   # 5 % chance a character spawns after each message
 SPAWN_COOLDOWN_SEC    = 120    # seconds before the same group can spawn again
 CATCH_WINDOW_SEC      = 90     # seconds players have to /catch the spawned char
+USER_FLUSH_SEC        = 5      # seconds between batched user upserts from group chatter
 
 # ── Economy ───────────────────────────────────────────────────────────────────
 DAILY_COINS           = 100
+DAILY_COOLDOWN_SEC    = 86400  # seconds between two /daily claims
+DUEL_COOLDOWN_SEC     = 300    # seconds a user waits between starting duels
 BURN_COIN_VALUE       = 10     # coins earned when burning a duplicate
 TRADE_MIN_COINS       = 0      # minimum coins required to trade
+TRADE_EXPIRY_SEC      = 3600   # pending trades older than this are expired and their escrow returned
+CATCH_COINS           = 10     # coins awarded for every successful catch
+CATCH_MILESTONES      = [10, 50, 100, 250, 500, 1000]   # total catches that unlock a milestone level
+MILESTONE_BONUS_COINS = 250    # bonus coins when a new milestone level is reached
 
 # ── Rarity Config (name → spawn weight) ───────────────────────────────────────
 RARITY_WEIGHTS = {
@@ -29,4 +36,32 @@ RARITY_COLORS = {
     "💫 Rare":      "#2196F3",
     "✨ Epic":       "#9C27B0",
     "🌠 Legendary": "#FF9800",
-}
\ No newline at end of file
+}
+
+# ── Persistence ───────────────────────────────────────────────────────────────
+BACKUP_INTERVAL_SEC   = 300    # max seconds a change waits before a database snapshot is taken (time-based only)
+BACKUP_KEEP           = 24     # snapshots kept in data/backups (~2 hours at the default interval); older ones are deleted
+BACKUP_PAGES_PER_STEP = 256    # pages copied per online-backup step
+BACKUP_STEP_SLEEP     = 0.005  # seconds between backup steps, so writers get the database
+BACKUP_MAX_RESTARTS   = 3      # concurrent writes restart a stepped backup; then copy in one step
+BACKUP_COMPRESSION    = "auto" # "gzip", "zstd", or "auto" (zstd when the zstandard package is installed)
+NDJSON_IMPORT_BATCH   = 1000   # rows per executemany when loading an NDJSON export
+COUNTER_FLUSH_MS      = 5      # group-commit window for queued counter deltas
+COUNTER_BATCH_SIZE    = 256    # commit queued counter deltas early after this many operations
+COMPACT_COLLECTIONS   = False  # store one (user, character) -> count row instead of one row per copy
+LEADERBOARD_CACHE_SEC = 30     # how long a leaderboard page is served from memory
+LEADERBOARD_CACHE_MAX = 256    # cached leaderboard pages kept at most; expired ones are pruned first
+LEADERBOARD_SNAPSHOT_CHUNK = 2000   # weekly snapshot rows copied per write transaction
+LEADERBOARD_SNAPSHOT_SLEEP = 0.01   # seconds between weekly snapshot chunks, so bot writes get the database
+
+# ── Broadcast ─────────────────────────────────────────────────────────────────
+BROADCAST_RATE            = 25   # messages per second across all chats (Telegram allows ~30)
+BROADCAST_CHAT_INTERVAL   = 1.0  # minimum seconds between two messages to the same chat
+BROADCAST_CHUNK           = 500  # user ids read, sent and checkpointed per batch
+BROADCAST_MAX_RETRIES     = 3    # attempts per message on network errors
+BROADCAST_MAX_RATE_LIMITS = 10   # 429 replies tolerated per message before it counts as failed
+
+# ── Character Import ──────────────────────────────────────────────────────────
+IMPORT_BATCH_SIZE       = 500  # rows validated, URL-checked and inserted per transaction
+IMPORT_URL_CONCURRENCY  = 20   # simultaneous image_url checks
+IMPORT_URL_TIMEOUT      = 10   # seconds before an image_url check counts as unreachable
@@ -1,47 +1,628 @@
 """
 database.py – Complete SQLite persistence layer for WaifuBot
-Includes: Auto-Migrations & Auto-JSON Database Sync
+Includes: Auto-Migrations, Write-Behind Snapshots & NDJSON Export/Import
 """
 
 import sqlite3
 import os
+import gzip
 import json
-from datetime import datetime
+import base64
+import time
+import random
+import secrets
+import atexit
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+import config
 
 # Path configuration
 BASE_DIR = os.path.dirname(__file__)
-DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR = os.environ.get("WAIFUBOT_DATA_DIR") or os.path.join(BASE_DIR, "data")   # overridden by tests/benchmarks
 DB_PATH = os.path.join(DATA_DIR, "waifubot.db")
-JSON_PATH = os.path.join(DATA_DIR, "database_backup.json")
+BACKUP_DIR = os.path.join(DATA_DIR, "backups")
 
-def _conn():
+# Applied once per connection, not per call
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA synchronous=NORMAL",      # WAL keeps this crash-safe; skips an fsync per commit
+    "PRAGMA cache_size=-16000",       # 16 MB page cache
+    "PRAGMA mmap_size=268435456",     # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+STATEMENT_CACHE_SIZE = 256
+
+# ── Connection Pool ────────────────────────────────────────────────────────
+# One long-lived connection per thread. `with _conn() as con:` still commits
+# or rolls back on exit, it just no longer closes the connection.
+_pool = {}                  # thread ident -> connection
+_pool_lock = threading.Lock()
+
+def _open_connection():
     os.makedirs(DATA_DIR, exist_ok=True)
-    con = sqlite3.connect(DB_PATH)
+    con = sqlite3.connect(DB_PATH, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
     con.row_factory = sqlite3.Row
-    con.execute("PRAGMA journal_mode=WAL")
-    con.execute("PRAGMA foreign_keys=ON")
+    for pragma in _PRAGMAS:
+        con.execute(pragma)
+    return con
+
+def _conn():
+    ident = threading.get_ident()
+    con = _pool.get(ident)
+    if con is None:
+        con = _open_connection()
+        with _pool_lock:
+            alive = {t.ident for t in threading.enumerate()}
+            for dead in [i for i in _pool if i not in alive]:
+                _pool.pop(dead).close()
+            _pool[ident] = con
     return con
 
-def sync_to_json():
-    """Automatically exports the SQLite database to a JSON file."""
+def close_connections():
+    """Closes every pooled connection; threads reopen lazily on next use."""
+    with _pool_lock:
+        for con in _pool.values():
+            con.close()
+        _pool.clear()
+
+# ── Snapshots ─────────────────────────────────────────────────────────────
+# Durable copies of the whole database (every table) made with SQLite's
+# online backup API. Pages are copied BACKUP_PAGES_PER_STEP at a time and, in
+# WAL mode, each step only holds a read snapshot, so writers keep going.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SNAPSHOT_PREFIX = "waifubot-"
+SNAPSHOT_SUFFIXES = (".db.gz", ".db.zst")
+
+def _snapshot_format():
+    if config.BACKUP_COMPRESSION == "zstd" or (config.BACKUP_COMPRESSION == "auto" and zstandard is not None):
+        if zstandard is None:
+            raise RuntimeError("BACKUP_COMPRESSION='zstd' needs the zstandard package")
+        return ".db.zst"
+    return ".db.gz"
+
+def _compressed_writer(path):
+    if path.endswith(".zst"):
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+    return gzip.open(path, "wb", compresslevel=6)
+
+def _compressed_reader(path):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed; install the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+class _BackupRestarted(Exception):
+    pass
+
+def _copy_database(source, target_path, pages, sleep):
+    """
+    Online backup of `source` into a new file at target_path. SQLite restarts
+    a stepped backup whenever another connection writes to the source; after
+    a few restarts the copy is finished in one step instead.
+    Returns the number of restarts.
+    """
+    seen = {"remaining": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        if seen["remaining"] is not None and remaining > seen["remaining"]:
+            seen["restarts"] += 1
+            if seen["restarts"] > config.BACKUP_MAX_RESTARTS:
+                raise _BackupRestarted
+        seen["remaining"] = remaining
+
+    target = sqlite3.connect(target_path)
     try:
-        data = {
-            "exported_at": datetime.now().isoformat(),
-            "characters": [],
-            "users": [],
-            "stats": {}
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        except _BackupRestarted:
+            source.backup(target)
+        check = target.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise sqlite3.DatabaseError(f"snapshot failed quick_check: {check}")
+    finally:
+        target.close()
+    return seen["restarts"]
+
+def list_snapshots():
+    """Snapshot paths in BACKUP_DIR, newest first."""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    # Finished snapshots only: a .part file is one still being written
+    names = [n for n in os.listdir(BACKUP_DIR) if n.startswith(SNAPSHOT_PREFIX) and n.endswith(SNAPSHOT_SUFFIXES)]
+    return [os.path.join(BACKUP_DIR, n) for n in sorted(names, reverse=True)]
+
+def _rotate_snapshots(keep):
+    for path in list_snapshots()[keep:]:
+        os.remove(path)
+
+def _write_snapshot():
+    """Copies the database to a compressed, quick_check-verified file in BACKUP_DIR. Returns its path and stats."""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(BACKUP_DIR, f"{SNAPSHOT_PREFIX}{stamp}{_snapshot_format()}")
+    fd, raw_path = tempfile.mkstemp(dir=BACKUP_DIR, prefix=".snapshot-", suffix=".db")
+    os.close(fd)
+    tmp_path = path + ".part"
+    source = _open_connection()
+    try:
+        restarts = _copy_database(source, raw_path, config.BACKUP_PAGES_PER_STEP, config.BACKUP_STEP_SLEEP)
+        with open(raw_path, "rb") as src, _compressed_writer(tmp_path) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        stats = {"raw_bytes": os.path.getsize(raw_path), "bytes": os.path.getsize(path), "restarts": restarts}
+    finally:
+        source.close()
+        for leftover in (raw_path, tmp_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    _rotate_snapshots(config.BACKUP_KEEP)
+    return path, stats
+
+def snapshot_now():
+    """Takes a snapshot immediately, outside the write-behind schedule. Returns its path."""
+    return _write_snapshot()[0]
+
+def restore_snapshot(path):
+    """
+    Replaces the live database with a snapshot. The snapshot is decompressed
+    to a scratch file and must pass integrity_check before anything is
+    touched; it is then copied in with the backup API (safe with WAL files)
+    and the restored row counts are compared against the snapshot's.
+    Stop the bot first. Returns {table: row count}.
+    """
+    fd, raw_path = tempfile.mkstemp(dir=DATA_DIR, prefix=".restore-", suffix=".db")
+    try:
+        with os.fdopen(fd, "wb") as dst, _compressed_reader(path) as src:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        snapshot = sqlite3.connect(raw_path)
+        try:
+            check = snapshot.execute("PRAGMA integrity_check").fetchone()[0]
+            if check != "ok":
+                raise sqlite3.DatabaseError(f"{path} failed integrity_check: {check}")
+            expected = _table_counts(snapshot)
+            close_connections()
+            target = sqlite3.connect(DB_PATH)
+            try:
+                snapshot.backup(target)
+                restored = _table_counts(target)
+            finally:
+                target.close()
+        finally:
+            snapshot.close()
+    finally:
+        os.remove(raw_path)
+    if restored != expected:
+        raise sqlite3.DatabaseError(f"restore mismatch: expected {expected}, got {restored}")
+    _reset_caches()
+    return restored
+
+def _reset_caches():
+    """Drops every in-memory copy of table data after the database was replaced underneath it."""
+    _characters.invalidate()
+    with _known_users_lock:
+        _known_users.clear()
+    load_banned_users()
+    clear_leaderboard_cache()
+
+def _table_counts(con):
+    tables = [r[0] for r in con.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'"
+    ).fetchall()]
+    return {t: con.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in tables}
+
+class _BackupWriter:
+    """
+    Write-behind snapshots. Mutations only bump a dirty counter; a daemon
+    thread takes a snapshot once BACKUP_INTERVAL_SEC has passed since the
+    first unsaved change. There is deliberately no change-count trigger: each
+    snapshot copies the whole database, and at busy write rates a count would
+    fire every few seconds and rotate BACKUP_KEEP snapshots away within minutes.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pending = 0
+        self._first_dirty = None
+        self._stats = {
+            "notifications": 0,
+            "flushes": 0,
+            "errors": 0,
+            "last_flush_ms": 0.0,
+            "last_flush_at": None,
+            "last_snapshot": None,
+            "last_bytes": 0,
+            "last_raw_bytes": 0,
+            "restarts": 0,
         }
-        with _conn() as con:
-            data["characters"] = [dict(row) for row in con.execute("SELECT * FROM characters").fetchall()]
-            data["users"] = [dict(row) for row in con.execute("SELECT * FROM users").fetchall()]
-        
-        with open(JSON_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-    except Exception as e:
-        print(f"JSON Sync Error: {e}")
+
+    def mark_dirty(self):
+        with self._cond:
+            self._pending += 1
+            self._stats["notifications"] += 1
+            if self._first_dirty is None:
+                self._first_dirty = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-snapshot", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._first_dirty is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self._first_dirty + self.interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self.flush()
+
+    def flush(self):
+        """Takes a snapshot now if anything changed. Returns True if written."""
+        with self._flush_lock:
+            with self._cond:
+                pending = self._pending
+                self._pending = 0
+                self._first_dirty = None
+            if not pending:
+                return False
+            started = time.perf_counter()
+            try:
+                path, stats = _write_snapshot()
+            except Exception as e:
+                with self._cond:
+                    self._stats["errors"] += 1
+                    # Keep the changes pending so the next attempt covers them
+                    self._pending += pending
+                    if self._first_dirty is None:
+                        self._first_dirty = time.monotonic()
+                print(f"Snapshot Error: {e}")
+                return False
+            with self._cond:
+                self._stats["flushes"] += 1
+                self._stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+                self._stats["last_flush_at"] = datetime.now().isoformat()
+                self._stats["last_snapshot"] = path
+                self._stats["last_bytes"] = stats["bytes"]
+                self._stats["last_raw_bytes"] = stats["raw_bytes"]
+                self._stats["restarts"] += stats["restarts"]
+            return True
+
+    def metrics(self):
+        with self._cond:
+            return dict(self._stats, pending=self._pending)
+
+_backup = _BackupWriter(config.BACKUP_INTERVAL_SEC)
+
+def _mark_dirty():
+    _backup.mark_dirty()
+
+def flush_backup():
+    """Takes any pending snapshot now (used on shutdown)."""
+    return _backup.flush()
+
+def backup_metrics():
+    """Counters for the write-behind snapshots: notifications, flushes, errors, pending, sizes, timings."""
+    return _backup.metrics()
+
+atexit.register(flush_backup)
+
+# ── Migrations ────────────────────────────────────────────────────────────
+# Each entry runs once, in order, inside its own transaction; PRAGMA
+# user_version records how many have been applied. Append only, never edit
+# or reorder a migration that has shipped.
+def _migrate_legacy_columns(con):
+    """Adds columns that older databases were created without."""
+    char_cols = [c[1] for c in con.execute("PRAGMA table_info(characters)").fetchall()]
+    if 'is_custom' not in char_cols:
+        con.execute("ALTER TABLE characters ADD COLUMN is_custom INTEGER DEFAULT 0")
+    if 'owner_id' not in char_cols:
+        con.execute("ALTER TABLE characters ADD COLUMN owner_id INTEGER DEFAULT NULL")
+
+    # Fixes "IndexError: wins"
+    user_cols = [c[1] for c in con.execute("PRAGMA table_info(users)").fetchall()]
+    if 'wins' not in user_cols:
+        con.execute("ALTER TABLE users ADD COLUMN wins INTEGER DEFAULT 0")
+    if 'losses' not in user_cols:
+        con.execute("ALTER TABLE users ADD COLUMN losses INTEGER DEFAULT 0")
+    if 'milestone_level' not in user_cols:
+        con.execute("ALTER TABLE users ADD COLUMN milestone_level INTEGER DEFAULT 0")
+
+def _fts_statements(table, tokenize):
+    """External-content FTS5 index over characters(name, anime) plus sync triggers."""
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+        f"name, anime, content='characters', content_rowid='id', tokenize=\"{tokenize}\")",
+        f"INSERT INTO {table}({table}) VALUES ('rebuild')",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_insert AFTER INSERT ON characters BEGIN
+            INSERT INTO {table}(rowid, name, anime) VALUES (NEW.id, NEW.name, NEW.anime);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_delete AFTER DELETE ON characters BEGIN
+            INSERT INTO {table}({table}, rowid, name, anime) VALUES ('delete', OLD.id, OLD.name, OLD.anime);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_update AFTER UPDATE OF name, anime ON characters BEGIN
+            INSERT INTO {table}({table}, rowid, name, anime) VALUES ('delete', OLD.id, OLD.name, OLD.anime);
+            INSERT INTO {table}(rowid, name, anime) VALUES (NEW.id, NEW.name, NEW.anime);
+        END""",
+    ]
+
+def _trigram_supported():
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def _migrate_character_search(con):
+    """FTS5 word/prefix index, plus a trigram index for fuzzy matches when SQLite has it (3.34+)."""
+    statements = _fts_statements("characters_fts", "unicode61 remove_diacritics 2")
+    if _trigram_supported():
+        statements += _fts_statements("characters_trgm", "trigram")
+    for statement in statements:
+        con.execute(statement)
+
+MIGRATIONS = [
+    # 1
+    _migrate_legacy_columns,
+    # 2 – indexes for the hot collection, leaderboard and trade lookups
+    """
+    CREATE INDEX IF NOT EXISTS idx_collections_user_char ON collections(user_id, char_id);
+    CREATE INDEX IF NOT EXISTS idx_collections_char      ON collections(char_id);
+    CREATE INDEX IF NOT EXISTS idx_users_catches         ON users(catches DESC);
+    CREATE INDEX IF NOT EXISTS idx_trades_to_status      ON trades(to_user, status);
+    """,
+    # 3 – collection sort keys copied from characters so keyset pages walk an index
+    """
+    ALTER TABLE collections ADD COLUMN sort_group  INTEGER;   -- 0 = custom first, 1 = regular
+    ALTER TABLE collections ADD COLUMN sort_rarity TEXT;
+    ALTER TABLE collections ADD COLUMN sort_name   TEXT;
+    UPDATE collections SET (sort_group, sort_rarity, sort_name) =
+        (SELECT 1 - ch.is_custom, ch.rarity, ch.name FROM characters ch WHERE ch.id = collections.char_id);
+    CREATE INDEX IF NOT EXISTS idx_collections_user_sort
+        ON collections(user_id, sort_group, sort_rarity, sort_name);
+    CREATE TRIGGER IF NOT EXISTS trg_collections_sort_key AFTER INSERT ON collections
+    BEGIN
+        UPDATE collections SET (sort_group, sort_rarity, sort_name) =
+            (SELECT 1 - is_custom, rarity, name FROM characters WHERE id = NEW.char_id)
+        WHERE id = NEW.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_characters_sort_key AFTER UPDATE OF name, rarity, is_custom ON characters
+    BEGIN
+        UPDATE collections SET sort_group = 1 - NEW.is_custom, sort_rarity = NEW.rarity, sort_name = NEW.name
+        WHERE char_id = NEW.id;
+    END;
+    """,
+    # 4 – compact collection model (one row per user/character, used when COMPACT_COLLECTIONS)
+    """
+    CREATE TABLE IF NOT EXISTS collection_counts (
+        id           INTEGER PRIMARY KEY,
+        user_id      INTEGER NOT NULL,
+        char_id      INTEGER NOT NULL,
+        count        INTEGER NOT NULL DEFAULT 1,
+        first_caught TEXT    DEFAULT (datetime('now')),
+        last_caught  TEXT    DEFAULT (datetime('now')),
+        sort_group   INTEGER,
+        sort_rarity  TEXT,
+        sort_name    TEXT,
+        UNIQUE(user_id, char_id),
+        FOREIGN KEY (user_id) REFERENCES users(user_id),
+        FOREIGN KEY (char_id) REFERENCES characters(id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_collection_counts_char ON collection_counts(char_id);
+    CREATE INDEX IF NOT EXISTS idx_collection_counts_user_sort
+        ON collection_counts(user_id, sort_group, sort_rarity, sort_name);
+    CREATE TRIGGER IF NOT EXISTS trg_collection_counts_sort_key AFTER INSERT ON collection_counts
+    BEGIN
+        UPDATE collection_counts SET (sort_group, sort_rarity, sort_name) =
+            (SELECT 1 - is_custom, rarity, name FROM characters WHERE id = NEW.char_id)
+        WHERE id = NEW.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_characters_count_sort_key AFTER UPDATE OF name, rarity, is_custom ON characters
+    BEGIN
+        UPDATE collection_counts SET sort_group = 1 - NEW.is_custom, sort_rarity = NEW.rarity, sort_name = NEW.name
+        WHERE char_id = NEW.id;
+    END;
+    """,
+    # 5 – trigger-maintained totals and per-day buckets for get_stats()
+    """
+    CREATE TABLE IF NOT EXISTS stats_counters (
+        id               INTEGER PRIMARY KEY CHECK (id = 1),
+        total_users      INTEGER NOT NULL DEFAULT 0,
+        total_characters INTEGER NOT NULL DEFAULT 0,
+        custom_waifus    INTEGER NOT NULL DEFAULT 0,
+        total_catches    INTEGER NOT NULL DEFAULT 0,
+        total_trades     INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS stats_daily (
+        day        TEXT    PRIMARY KEY,
+        catches    INTEGER NOT NULL DEFAULT 0,
+        new_users  INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR REPLACE INTO stats_counters VALUES (1,
+        (SELECT COUNT(*) FROM users),
+        (SELECT COUNT(*) FROM characters WHERE is_custom=0),
+        (SELECT COUNT(*) FROM characters WHERE is_custom=1),
+        (SELECT COALESCE(SUM(catches),0) FROM users),
+        (SELECT COUNT(*) FROM trades WHERE status='accepted'));
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_user_insert AFTER INSERT ON users
+    BEGIN
+        UPDATE stats_counters SET total_users = total_users + 1, total_catches = total_catches + NEW.catches WHERE id = 1;
+        INSERT INTO stats_daily (day, new_users) VALUES (date('now'), 1)
+            ON CONFLICT(day) DO UPDATE SET new_users = new_users + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_user_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE stats_counters SET total_users = total_users - 1, total_catches = total_catches - OLD.catches WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_user_catches AFTER UPDATE OF catches ON users
+        WHEN NEW.catches <> OLD.catches
+    BEGIN
+        UPDATE stats_counters SET total_catches = total_catches + NEW.catches - OLD.catches WHERE id = 1;
+        INSERT INTO stats_daily (day, catches) VALUES (date('now'), NEW.catches - OLD.catches)
+            ON CONFLICT(day) DO UPDATE SET catches = catches + excluded.catches;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_character_insert AFTER INSERT ON characters
+    BEGIN
+        UPDATE stats_counters SET total_characters = total_characters + (NEW.is_custom = 0),
+                                  custom_waifus    = custom_waifus    + (NEW.is_custom = 1) WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_character_delete AFTER DELETE ON characters
+    BEGIN
+        UPDATE stats_counters SET total_characters = total_characters - (OLD.is_custom = 0),
+                                  custom_waifus    = custom_waifus    - (OLD.is_custom = 1) WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_character_custom AFTER UPDATE OF is_custom ON characters
+    BEGIN
+        UPDATE stats_counters SET total_characters = total_characters - (OLD.is_custom = 0) + (NEW.is_custom = 0),
+                                  custom_waifus    = custom_waifus    - (OLD.is_custom = 1) + (NEW.is_custom = 1) WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_trade_insert AFTER INSERT ON trades WHEN NEW.status = 'accepted'
+    BEGIN
+        UPDATE stats_counters SET total_trades = total_trades + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_trade_status AFTER UPDATE OF status ON trades
+        WHEN (NEW.status = 'accepted') <> (OLD.status = 'accepted')
+    BEGIN
+        UPDATE stats_counters SET total_trades = total_trades + (NEW.status = 'accepted') - (OLD.status = 'accepted') WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_trade_delete AFTER DELETE ON trades WHEN OLD.status = 'accepted'
+    BEGIN
+        UPDATE stats_counters SET total_trades = total_trades - 1 WHERE id = 1;
+    END;
+    """,
+    # 6 – leaderboard orderings for coins and wins (catches is covered by migration 2)
+    """
+    CREATE INDEX IF NOT EXISTS idx_users_coins ON users(coins DESC);
+    CREATE INDEX IF NOT EXISTS idx_users_wins  ON users(wins DESC);
+    """,
+    # 7 – weekly snapshot deltas and per-week rank lookups
+    """
+    ALTER TABLE leaderboard_history ADD COLUMN weekly_catches INTEGER DEFAULT 0;
+    ALTER TABLE leaderboard_history ADD COLUMN prev_rank      INTEGER DEFAULT NULL;
+    CREATE INDEX IF NOT EXISTS idx_leaderboard_history_week ON leaderboard_history(week, rank);
+    """,
+    # 8
+    _migrate_character_search,
+    # 9 – loads the banned-user set without scanning users
+    """
+    CREATE INDEX IF NOT EXISTS idx_users_banned ON users(user_id) WHERE banned=1;
+    """,
+    # 10 – broadcast checkpoints (see broadcast.py)
+    """
+    CREATE TABLE IF NOT EXISTS broadcasts (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        text         TEXT    NOT NULL,
+        status       TEXT    NOT NULL DEFAULT 'running',
+        last_user_id INTEGER NOT NULL DEFAULT 0,
+        sent         INTEGER NOT NULL DEFAULT 0,
+        failed       INTEGER NOT NULL DEFAULT 0,
+        created_at   TEXT    DEFAULT (datetime('now')),
+        finished_at  TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts(status);
+    """,
+    # 11 – one redemption per (code, user); drop any duplicates logged before the guard existed
+    """
+    DELETE FROM redeem_log WHERE id NOT IN (SELECT MIN(id) FROM redeem_log GROUP BY code, user_id);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_redeem_log_code_user ON redeem_log(code, user_id);
+    """,
+    # 12 – trade escrow; trades created before this hold nothing, so escrow=0 keeps them from being refunded
+    """
+    ALTER TABLE trades ADD COLUMN escrow INTEGER NOT NULL DEFAULT 0;
+    CREATE INDEX IF NOT EXISTS idx_trades_status_created ON trades(status, created_at);
+    """,
+    # 13 – cooldowns as integer epochs, carried over from the old text timestamps
+    """
+    ALTER TABLE users ADD COLUMN last_daily_at INTEGER;
+    ALTER TABLE users ADD COLUMN last_duel_at  INTEGER;
+    UPDATE users SET last_daily_at = CAST(strftime('%s', last_daily) AS INTEGER) WHERE last_daily IS NOT NULL;
+    UPDATE users SET last_duel_at  = CAST(strftime('%s', last_duel)  AS INTEGER) WHERE last_duel  IS NOT NULL;
+    """,
+    # 14 – weekly snapshots are copied in chunks; only weeks listed here are complete
+    """
+    CREATE TABLE IF NOT EXISTS leaderboard_weeks (
+        week         TEXT PRIMARY KEY,
+        players      INTEGER NOT NULL,
+        completed_at TEXT    DEFAULT (datetime('now'))
+    );
+    INSERT OR IGNORE INTO leaderboard_weeks (week, players)
+        SELECT week, COUNT(*) FROM leaderboard_history GROUP BY week;
+    """,
+]
+
+def _run_migrations(con):
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            if callable(step):
+                con.execute("BEGIN")
+                step(con)
+                con.execute(f"PRAGMA user_version={number}")
+                con.commit()
+            else:
+                con.executescript(f"BEGIN;\n{step}\nPRAGMA user_version={number};\nCOMMIT;")
+        except Exception:
+            if con.in_transaction:
+                con.rollback()
+            raise
+
+def _sync_collection_model(con):
+    """Moves collection rows into whichever model config.COMPACT_COLLECTIONS selects."""
+    if config.COMPACT_COLLECTIONS:
+        if con.execute("SELECT 1 FROM collections LIMIT 1").fetchone() is None:
+            return
+        con.executescript("""
+        BEGIN;
+        INSERT INTO collection_counts (user_id, char_id, count, first_caught, last_caught)
+            SELECT user_id, char_id, COUNT(*), MIN(caught_at), MAX(caught_at)
+            FROM collections WHERE true GROUP BY user_id, char_id
+            ON CONFLICT(user_id, char_id) DO UPDATE SET
+                count        = count + excluded.count,
+                first_caught = MIN(first_caught, excluded.first_caught),
+                last_caught  = MAX(last_caught, excluded.last_caught);
+        DELETE FROM collections;
+        COMMIT;
+        """)
+    else:
+        if con.execute("SELECT 1 FROM collection_counts LIMIT 1").fetchone() is None:
+            return
+        con.executescript("""
+        BEGIN;
+        WITH RECURSIVE copies(user_id, char_id, n, caught_at) AS (
+            SELECT user_id, char_id, count, last_caught FROM collection_counts
+            UNION ALL
+            SELECT user_id, char_id, n - 1, caught_at FROM copies WHERE n > 1
+        )
+        INSERT INTO collections (user_id, char_id, caught_at) SELECT user_id, char_id, caught_at FROM copies;
+        DELETE FROM collection_counts;
+        COMMIT;
+        """)
 
 def init_db():
-    """Initializes tables and automatically repairs missing columns (Migrations)."""
+    """Initializes tables and applies any pending migrations."""
     with _conn() as con:
         # 1. CREATE TABLES (Standard Schema)
         con.executescript("""
@@ -136,29 +717,161 @@ def init_db():
         );
         """)
 
-        # 2. AUTO-MIGRATION (Repairing the DB if it's old)
-        cursor = con.cursor()
-        
-        # Check 'characters' table
-        cursor.execute("PRAGMA table_info(characters)")
-        char_cols = [c[1] for c in cursor.fetchall()]
-        if 'is_custom' not in char_cols:
-            con.execute("ALTER TABLE characters ADD COLUMN is_custom INTEGER DEFAULT 0")
-        if 'owner_id' not in char_cols:
-            con.execute("ALTER TABLE characters ADD COLUMN owner_id INTEGER DEFAULT NULL")
-
-        # Check 'users' table (Fixes "IndexError: wins")
-        cursor.execute("PRAGMA table_info(users)")
-        user_cols = [c[1] for c in cursor.fetchall()]
-        if 'wins' not in user_cols:
-            con.execute("ALTER TABLE users ADD COLUMN wins INTEGER DEFAULT 0")
-        if 'losses' not in user_cols:
-            con.execute("ALTER TABLE users ADD COLUMN losses INTEGER DEFAULT 0")
-        if 'milestone_level' not in user_cols:
-            con.execute("ALTER TABLE users ADD COLUMN milestone_level INTEGER DEFAULT 0")
-
-    sync_to_json()
-    print("✅ Database initialized and sync complete.")
+        # 2. VERSIONED MIGRATIONS (PRAGMA user_version)
+        _run_migrations(con)
+        _sync_collection_model(con)
+
+    load_banned_users()
+    print("✅ Database initialized.")
+
+# ── Character Cache ───────────────────────────────────────────────────────
+# The characters table only changes through add/update/delete_character, so
+# the whole table is kept in memory and those writers refresh it.
+def _fetch_all_characters():
+    with _conn() as con:
+        return con.execute("SELECT * FROM characters").fetchall()
+
+def _fetch_character(char_id):
+    with _conn() as con:
+        return con.execute("SELECT * FROM characters WHERE id=?", (char_id,)).fetchone()
+
+class _CharacterCache:
+    """Read-through cache of character rows with per-rarity buckets."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = None           # id -> row, loaded on first use
+        self._by_rarity = {}        # rarity -> tuple of non-custom rows sorted by name
+        self._all = None            # non-custom rows sorted by rarity, name
+        self._sampler = None        # see spawn_sampler()
+        self.hits = 0
+        self.misses = 0
+
+    def _ensure_loaded(self):
+        if self._rows is None:
+            self._rows = {row["id"]: row for row in _fetch_all_characters()}
+            self._by_rarity.clear()
+            self._all = None
+            self._sampler = None
+
+    def get(self, char_id):
+        with self._lock:
+            self._ensure_loaded()
+            row = self._rows.get(char_id)
+            if row is not None:
+                self.hits += 1
+                return row
+            self.misses += 1
+        row = _fetch_character(char_id)
+        if row is not None:
+            with self._lock:
+                # invalidate() may have run during the fetch; the next load picks the row up then
+                if self._rows is not None:
+                    self._rows[row["id"]] = row
+                    self._drop_views(row["rarity"])
+        return row
+
+    def all(self):
+        with self._lock:
+            self._ensure_loaded()
+            if self._all is None:
+                playable = [r for r in self._rows.values() if not r["is_custom"]]
+                self._all = tuple(sorted(playable, key=lambda r: (r["rarity"], r["name"])))
+            return self._all
+
+    def by_rarity(self, rarity):
+        with self._lock:
+            self._ensure_loaded()
+            return self._bucket(rarity)
+
+    def _bucket(self, rarity):
+        bucket = self._by_rarity.get(rarity)
+        if bucket is None:
+            matching = [r for r in self._rows.values() if r["rarity"] == rarity and not r["is_custom"]]
+            bucket = self._by_rarity[rarity] = tuple(sorted(matching, key=lambda r: r["name"]))
+        return bucket
+
+    def spawn_sampler(self):
+        """(alias table over non-empty rarities, rarity -> bucket); rebuilt after writes."""
+        with self._lock:
+            self._ensure_loaded()
+            if self._sampler is None:
+                buckets = {}
+                for rarity, weight in config.RARITY_WEIGHTS.items():
+                    bucket = self._bucket(rarity)
+                    if weight > 0 and bucket:
+                        buckets[rarity] = bucket
+                table = _AliasTable(list(buckets), [config.RARITY_WEIGHTS[r] for r in buckets]) if buckets else None
+                self._sampler = (table, buckets)
+            return self._sampler
+
+    def _drop_views(self, *rarities):
+        for rarity in rarities:
+            self._by_rarity.pop(rarity, None)
+        self._all = None
+        self._sampler = None
+
+    def refresh(self, char_id):
+        """Re-reads one character after a write (row is None once deleted)."""
+        row = _fetch_character(char_id)
+        with self._lock:
+            if self._rows is None:
+                return
+            old = self._rows.pop(char_id, None)
+            if row is not None:
+                self._rows[char_id] = row
+            self._drop_views(*{r["rarity"] for r in (old, row) if r is not None})
+
+    def invalidate(self):
+        with self._lock:
+            self._rows = None
+
+    def metrics(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._rows) if self._rows is not None else 0}
+
+_characters = _CharacterCache()
+
+# ── Spawn Sampler ─────────────────────────────────────────────────────────
+class _AliasTable:
+    """Vose's alias method: O(1) weighted choice after O(n) setup."""
+
+    def __init__(self, items, weights):
+        n = len(items)
+        total = sum(weights)
+        prob = [w * n / total for w in weights]
+        alias = [0] * n
+        small = [i for i, p in enumerate(prob) if p < 1]
+        large = [i for i, p in enumerate(prob) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            alias[s] = l
+            prob[l] += prob[s] - 1
+            (small if prob[l] < 1 else large).append(l)
+        for i in small + large:
+            prob[i] = 1.0
+        self.items, self.prob, self.alias = items, prob, alias
+
+    def sample(self, rng=random):
+        i = int(rng.random() * len(self.items))
+        return self.items[i] if rng.random() < self.prob[i] else self.items[self.alias[i]]
+
+def pick_spawn_character(rng=random):
+    """
+    Picks a character to spawn: a rarity weighted by config.RARITY_WEIGHTS
+    (rarities with no characters are skipped), then a uniform character of
+    that rarity. Constant time in steady state; returns None if the roster is empty.
+    """
+    table, buckets = _characters.spawn_sampler()
+    if table is None:
+        return None
+    bucket = buckets[table.sample(rng)]
+    return bucket[int(rng.random() * len(bucket))]
+
+def character_cache_metrics():
+    """Hit/miss counters and row count for the in-memory character cache."""
+    return _characters.metrics()
 
 # ── Characters ─────────────────────────────────────────────────────────────
 def add_character(name, anime, rarity, image_url, added_by, is_custom=0, owner_id=None):
@@ -168,16 +881,36 @@ def add_character(name, anime, rarity, image_url, added_by, is_custom=0, owner_i
             (name, anime, rarity, image_url, added_by, is_custom, owner_id)
         )
         res = cur.lastrowid
-    sync_to_json()
+    _characters.refresh(res)
+    _mark_dirty()
     return res
 
-def get_character(char_id):
+def add_characters(rows):
+    """
+    Bulk add_character: inserts (name, anime, rarity, image_url, added_by)
+    tuples in one transaction, then drops the character cache once instead
+    of refreshing it per row. Returns the new ids.
+    """
+    ids = []
     with _conn() as con:
-        return con.execute("SELECT * FROM characters WHERE id=?", (char_id,)).fetchone()
+        for row in rows:
+            ids.append(con.execute(
+                "INSERT INTO characters (name,anime,rarity,image_url,added_by) VALUES (?,?,?,?,?)", row
+            ).lastrowid)
+    if ids:
+        _characters.invalidate()
+        _mark_dirty()
+    return ids
+
+def get_character(char_id):
+    return _characters.get(char_id)
 
 def get_all_characters():
-    with _conn() as con:
-        return con.execute("SELECT * FROM characters WHERE is_custom=0 ORDER BY rarity,name").fetchall()
+    return list(_characters.all())
+
+def get_characters_by_rarity(rarity):
+    """Non-custom characters of one rarity, sorted by name, served from memory."""
+    return _characters.by_rarity(rarity)
 
 def update_character(char_id, **fields):
     allowed = {"name","anime","rarity","image_url"}
@@ -186,27 +919,106 @@ def update_character(char_id, **fields):
     clause = ", ".join(f"{k}=?" for k in updates)
     with _conn() as con:
         con.execute(f"UPDATE characters SET {clause} WHERE id=?", (*updates.values(), char_id))
-    sync_to_json()
+    _characters.refresh(char_id)
+    _mark_dirty()
 
 def delete_character(char_id):
     with _conn() as con:
         con.execute("DELETE FROM collections WHERE char_id=?", (char_id,))
+        con.execute("DELETE FROM collection_counts WHERE char_id=?", (char_id,))
         con.execute("DELETE FROM characters WHERE id=?", (char_id,))
-    sync_to_json()
+    _characters.refresh(char_id)
+    _mark_dirty()
 
-def search_characters(query):
-    q = f"%{query}%"
+def _fts_terms(query):
+    """Splits user input into quoted FTS5 strings, so punctuation can't inject syntax."""
+    return ['"' + term.replace('"', '""') + '"' for term in query.split()]
+
+def search_characters(query, limit=50, fuzzy=True):
+    """
+    Searches name and anime through FTS5: every word must match as a prefix,
+    results ordered by BM25. If nothing matches and fuzzy is set, falls back
+    to the trigram index, ranking characters by how many trigrams they share
+    with the query (tolerates typos).
+    """
+    terms = _fts_terms(query)
+    if not terms:
+        return []
     with _conn() as con:
-        return con.execute("SELECT * FROM characters WHERE (name LIKE ? OR anime LIKE ?) AND is_custom=0",(q,q)).fetchall()
+        rows = con.execute("""
+            SELECT ch.* FROM characters_fts f JOIN characters ch ON ch.id=f.rowid
+            WHERE characters_fts MATCH ? AND ch.is_custom=0
+            ORDER BY bm25(characters_fts) LIMIT ?
+        """, (" ".join(t + "*" for t in terms), limit)).fetchall()
+        if rows or not fuzzy or not _has_trigram_index(con):
+            return rows
+        grams = {term[i:i + 3] for term in query.lower().split() for i in range(len(term) - 2)}
+        if not grams:
+            return rows
+        return con.execute("""
+            SELECT ch.* FROM characters_trgm f JOIN characters ch ON ch.id=f.rowid
+            WHERE characters_trgm MATCH ? AND ch.is_custom=0
+            ORDER BY bm25(characters_trgm) LIMIT ?
+        """, (" OR ".join(_fts_terms(" ".join(grams))), limit)).fetchall()
+
+_trigram_index = None           # whether migration 8 could create characters_trgm
+
+def _has_trigram_index(con):
+    global _trigram_index
+    if _trigram_index is None:
+        _trigram_index = con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='characters_trgm'"
+        ).fetchone() is not None
+    return _trigram_index
 
 # ── Users ──────────────────────────────────────────────────────────────────
+# user_id -> hash of (username, first_name) last written, so repeat upserts are skipped
+_known_users = {}
+_known_users_lock = threading.Lock()
+_user_write_stats = {"writes": 0, "writes_avoided": 0}
+
+def _changed_users(rows):
+    with _known_users_lock:
+        changed = [r for r in rows if _known_users.get(r[0]) != hash(r[1:])]
+        _user_write_stats["writes_avoided"] += len(rows) - len(changed)
+    return changed
+
+def _remember_users(rows):
+    with _known_users_lock:
+        for row in rows:
+            _known_users[row[0]] = hash(row[1:])
+        _user_write_stats["writes"] += len(rows)
+
 def ensure_user(user_id, username="", first_name=""):
+    rows = _changed_users([(user_id, username or "", first_name or "")])
+    if not rows:
+        return
     with _conn() as con:
         con.execute("""
             INSERT INTO users (user_id,username,first_name) VALUES (?,?,?)
             ON CONFLICT(user_id) DO UPDATE SET username=excluded.username, first_name=excluded.first_name
-        """, (user_id, username or "", first_name or ""))
-    sync_to_json()
+        """, rows[0])
+    _remember_users(rows)
+    _mark_dirty()
+
+def ensure_users(users):
+    """Batched ensure_user: upserts (user_id, username, first_name) tuples in one transaction."""
+    rows = _changed_users([(user_id, username or "", first_name or "") for user_id, username, first_name in users])
+    if not rows:
+        return 0
+    with _conn() as con:
+        con.executemany("""
+            INSERT INTO users (user_id,username,first_name) VALUES (?,?,?)
+            ON CONFLICT(user_id) DO UPDATE SET username=excluded.username, first_name=excluded.first_name
+        """, rows)
+    _remember_users(rows)
+    _mark_dirty()
+    return len(rows)
+
+def user_write_metrics():
+    """How many ensure_user upserts ran vs were skipped because nothing changed."""
+    with _known_users_lock:
+        return dict(_user_write_stats, known_users=len(_known_users))
 
 def get_user(user_id):
     with _conn() as con:
@@ -215,88 +1027,497 @@ def get_user(user_id):
 def update_coins(user_id, delta):
     with _conn() as con:
         con.execute("UPDATE users SET coins=MAX(0,coins+?) WHERE user_id=?", (delta, user_id))
-    sync_to_json()
+    _mark_dirty()
 
 def increment_catches(user_id):
     with _conn() as con:
         con.execute("UPDATE users SET catches=catches+1 WHERE user_id=?", (user_id,))
-    sync_to_json()
+    _mark_dirty()
 
 def set_last_daily(user_id, dt):
     with _conn() as con:
-        con.execute("UPDATE users SET last_daily=? WHERE user_id=?", (dt, user_id))
-    sync_to_json()
+        con.execute(
+            "UPDATE users SET last_daily=?, last_daily_at=CAST(strftime('%s', ?) AS INTEGER) WHERE user_id=?",
+            (dt, dt, user_id)
+        )
+    _mark_dirty()
+
+# ── Cooldowns ─────────────────────────────────────────────────────────────
+# Each claim is one upsert whose DO UPDATE only fires once the cooldown has
+# passed, so two racing /daily commands can't both pay out. Returns
+# (claimed, seconds left); the follow-up read only happens on a refusal.
+def _cooldown_left(con, column, user_id, cooldown, now):
+    last = con.execute(f"SELECT {column} FROM users WHERE user_id=?", (user_id,)).fetchone()[0]
+    return max(0, last + cooldown - now)
+
+def claim_daily(user_id, coins=None, cooldown=None):
+    coins = config.DAILY_COINS if coins is None else coins
+    cooldown = config.DAILY_COOLDOWN_SEC if cooldown is None else cooldown
+    now = int(time.time())
+    with _conn() as con:
+        claimed = con.execute("""
+            INSERT INTO users (user_id, coins, last_daily_at, last_daily) VALUES (?, ?, ?, datetime(?, 'unixepoch'))
+            ON CONFLICT(user_id) DO UPDATE SET
+                coins         = coins + excluded.coins,
+                last_daily_at = excluded.last_daily_at,
+                last_daily    = excluded.last_daily
+            WHERE last_daily_at IS NULL OR last_daily_at <= excluded.last_daily_at - ?
+        """, (user_id, coins, now, now, cooldown)).rowcount
+        if claimed:
+            _mark_dirty()
+            return True, 0
+        return False, _cooldown_left(con, "last_daily_at", user_id, cooldown, now)
+
+def start_duel_cooldown(user_id, cooldown=None):
+    cooldown = config.DUEL_COOLDOWN_SEC if cooldown is None else cooldown
+    now = int(time.time())
+    with _conn() as con:
+        claimed = con.execute("""
+            INSERT INTO users (user_id, last_duel_at, last_duel) VALUES (?, ?, datetime(?, 'unixepoch'))
+            ON CONFLICT(user_id) DO UPDATE SET
+                last_duel_at = excluded.last_duel_at,
+                last_duel    = excluded.last_duel
+            WHERE last_duel_at IS NULL OR last_duel_at <= excluded.last_duel_at - ?
+        """, (user_id, now, now, cooldown)).rowcount
+        if claimed:
+            _mark_dirty()
+            return True, 0
+        return False, _cooldown_left(con, "last_duel_at", user_id, cooldown, now)
 
 def set_milestone_level(user_id, level):
     with _conn() as con:
         con.execute("UPDATE users SET milestone_level=? WHERE user_id=?", (level, user_id))
-    sync_to_json()
+    _mark_dirty()
 
 def add_win(user_id):
     with _conn() as con:
         con.execute("UPDATE users SET wins=wins+1 WHERE user_id=?", (user_id,))
-    sync_to_json()
+    _mark_dirty()
 
 def add_loss(user_id):
     with _conn() as con:
         con.execute("UPDATE users SET losses=losses+1 WHERE user_id=?", (user_id,))
-    sync_to_json()
+    _mark_dirty()
+
+# Banned user ids, loaded by init_db() and kept current by ban_user/unban_user,
+# so update filtering (middleware.py) never has to read the users table
+_banned_users = set()
+
+def load_banned_users():
+    global _banned_users
+    with _conn() as con:
+        _banned_users = {r[0] for r in con.execute("SELECT user_id FROM users WHERE banned=1").fetchall()}
+    return len(_banned_users)
+
+def is_banned(user_id):
+    return user_id in _banned_users
 
 def ban_user(user_id):
     with _conn() as con:
         con.execute("UPDATE users SET banned=1 WHERE user_id=?", (user_id,))
+    _banned_users.add(user_id)
 
 def unban_user(user_id):
     with _conn() as con:
         con.execute("UPDATE users SET banned=0 WHERE user_id=?", (user_id,))
+    _banned_users.discard(user_id)
 
-def get_leaderboard():
+def get_all_user_ids():
+    with _conn() as con:
+        return [r[0] for r in con.execute("SELECT user_id FROM users WHERE banned=0").fetchall()]
+
+def get_user_ids_after(after=0, limit=500):
+    """Next `limit` non-banned user ids above `after`, in id order (a primary-key range read)."""
+    with _conn() as con:
+        return [r[0] for r in con.execute(
+            "SELECT user_id FROM users WHERE user_id>? AND banned=0 ORDER BY user_id LIMIT ?",
+            (after, limit)
+        ).fetchall()]
+
+def iter_user_ids(after=0, chunk_size=500):
+    """Yields get_user_ids_after() chunks until every user id has been seen."""
+    while True:
+        ids = get_user_ids_after(after, chunk_size)
+        if not ids:
+            return
+        yield ids
+        after = ids[-1]
+
+# ── Leaderboard ───────────────────────────────────────────────────────────
+# Each metric has a descending index, so top-N pages walk the index and a
+# user's rank is a covering-index count of the players ahead of them.
+LEADERBOARD_METRICS = ("catches", "coins", "wins")
+_leaderboard_cache = {}         # (metric, page, per_page) -> (expires_at, rows)
+_leaderboard_lock = threading.Lock()
+
+def _check_metric(metric):
+    if metric not in LEADERBOARD_METRICS:
+        raise ValueError(f"Unknown leaderboard metric: {metric}")
+
+def _prune_leaderboard_cache(now):
+    """Drops expired pages, then the oldest ones while the cache is full (caller holds _leaderboard_lock)."""
+    for key in [k for k, (expires_at, _) in _leaderboard_cache.items() if expires_at <= now]:
+        del _leaderboard_cache[key]
+    while len(_leaderboard_cache) >= config.LEADERBOARD_CACHE_MAX:
+        del _leaderboard_cache[next(iter(_leaderboard_cache))]
+
+def get_leaderboard_page(metric="catches", page=0, per_page=10):
+    """Top players by metric; pages are cached for LEADERBOARD_CACHE_SEC."""
+    _check_metric(metric)
+    key = (metric, page, per_page)
+    now = time.monotonic()
+    with _leaderboard_lock:
+        cached = _leaderboard_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
     with _conn() as con:
-        return con.execute(
-            "SELECT user_id,first_name,username,catches,coins,wins FROM users ORDER BY catches DESC LIMIT 10"
+        rows = con.execute(
+            f"SELECT user_id,first_name,username,catches,coins,wins FROM users ORDER BY {metric} DESC, user_id LIMIT ? OFFSET ?",
+            (per_page, page * per_page)
         ).fetchall()
+    with _leaderboard_lock:
+        _prune_leaderboard_cache(now)
+        _leaderboard_cache[key] = (now + config.LEADERBOARD_CACHE_SEC, rows)
+    return rows
 
-def get_all_user_ids():
+def get_leaderboard():
+    return get_leaderboard_page("catches")
+
+def get_user_rank(user_id, metric="catches"):
+    """
+    Returns {"rank", "value", "total"} for user_id by metric (ties share a
+    rank), or None if the user does not exist.
+    """
+    _check_metric(metric)
     with _conn() as con:
-        return [r[0] for r in con.execute("SELECT user_id FROM users WHERE banned=0").fetchall()]
+        row = con.execute(f"""
+            SELECT u.{metric} AS value,
+                   (SELECT COUNT(*) FROM users WHERE {metric} > u.{metric}) + 1 AS rank,
+                   (SELECT total_users FROM stats_counters WHERE id=1) AS total
+            FROM users u WHERE u.user_id=?
+        """, (user_id,)).fetchone()
+    return dict(row) if row else None
+
+def clear_leaderboard_cache():
+    with _leaderboard_lock:
+        _leaderboard_cache.clear()
+
+# ── Weekly Leaderboard History ────────────────────────────────────────────
+def current_week(now=None):
+    """ISO week key used by leaderboard_history, e.g. '2024-W07'."""
+    year, week, _ = (now or datetime.now()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def snapshot_weekly_leaderboard(week=None, chunk_size=None):
+    """
+    Writes the ranking of every player with catches for `week` (default: this
+    week). RANK() runs in a set-based INSERT ... SELECT into a temp table,
+    which only needs a WAL read snapshot, so writers carry on meanwhile. The
+    result is copied into leaderboard_history in user_id order (sequential
+    index inserts), one short write transaction per chunk_size rows with a
+    pause after each so waiting bot writes get the lock (the busy handler
+    polls, it doesn't queue). The week is listed in leaderboard_weeks once
+    complete. weekly_catches and prev_rank come from an index lookup into
+    the previous complete week only.
+    Re-running for the same week replaces it. Returns the number of rows written.
+    """
+    week = week or current_week()
+    chunk_size = chunk_size or config.LEADERBOARD_SNAPSHOT_CHUNK
+    con = _conn()
+    try:
+        with con:
+            # Unlisting the week first makes readers fall back to the previous one while it is rebuilt
+            con.execute("DELETE FROM leaderboard_weeks WHERE week=?", (week,))
+        with con:
+            prev_week = con.execute("SELECT MAX(week) FROM leaderboard_weeks WHERE week < ?", (week,)).fetchone()[0]
+            con.execute("DROP TABLE IF EXISTS temp.weekly_ranking")
+            con.execute("""
+                CREATE TEMP TABLE weekly_ranking AS
+                SELECT u.user_id, RANK() OVER (ORDER BY u.catches DESC) AS rank, u.catches,
+                       u.catches - COALESCE(p.catches, 0) AS weekly_catches, p.rank AS prev_rank
+                FROM users u LEFT JOIN leaderboard_history p ON p.user_id=u.user_id AND p.week=?
+                WHERE u.catches > 0
+                ORDER BY u.user_id
+            """, (prev_week,))
+        while True:
+            with con:
+                if not con.execute("""
+                    DELETE FROM leaderboard_history WHERE id IN (
+                        SELECT id FROM leaderboard_history WHERE week=? LIMIT ?
+                    )
+                """, (week, chunk_size)).rowcount:
+                    break
+            time.sleep(config.LEADERBOARD_SNAPSHOT_SLEEP)
+        written = 0
+        total = con.execute("SELECT MAX(rowid) FROM temp.weekly_ranking").fetchone()[0] or 0
+        for low in range(0, total, chunk_size):
+            with con:
+                written += con.execute("""
+                    INSERT INTO leaderboard_history (user_id, week, rank, catches, weekly_catches, prev_rank)
+                    SELECT user_id, ?, rank, catches, weekly_catches, prev_rank
+                    FROM temp.weekly_ranking WHERE rowid > ? AND rowid <= ?
+                """, (week, low, low + chunk_size)).rowcount
+            # Checkpoint here rather than leaving a large one to the next bot write's autocheckpoint
+            con.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            time.sleep(config.LEADERBOARD_SNAPSHOT_SLEEP)
+        with con:
+            con.execute("INSERT INTO leaderboard_weeks (week, players) VALUES (?, ?)", (week, written))
+    finally:
+        con.execute("DROP TABLE IF EXISTS temp.weekly_ranking")
+    return written
+
+def get_weekly_leaderboard(week=None, limit=10):
+    """Top `limit` rows of a weekly snapshot (default: the latest complete one)."""
+    with _conn() as con:
+        if week is None:
+            week = con.execute("SELECT MAX(week) FROM leaderboard_weeks").fetchone()[0]
+        return con.execute("""
+            SELECT h.user_id,u.first_name,u.username,h.rank,h.catches,h.weekly_catches,h.prev_rank
+            FROM leaderboard_history h JOIN users u ON u.user_id=h.user_id
+            WHERE h.week=? ORDER BY h.rank LIMIT ?
+        """, (week, limit)).fetchall()
+
+# ── Counter Group Commit ──────────────────────────────────────────────────
+class _CounterBatcher:
+    """
+    Group commit for hot counters. Deltas queued for the same user are merged
+    and applied in one transaction every COUNTER_FLUSH_MS (or as soon as
+    COUNTER_BATCH_SIZE operations are waiting), so a spawn burst pays for one
+    WAL commit instead of one per increment.
+    """
+
+    FIELDS = ("coins", "catches", "wins", "losses")
+
+    def __init__(self, flush_ms, batch_size):
+        self.interval = flush_ms / 1000
+        self.batch_size = batch_size
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._deltas = {}           # user_id -> [coins, catches, wins, losses]
+        self._futures = []
+        self._first_queued = None
+        self._stats = {"operations": 0, "batches": 0, "rows_written": 0, "errors": 0}
+
+    def queue(self, user_id, deltas):
+        future = Future()
+        with self._cond:
+            merged = self._deltas.setdefault(user_id, [0, 0, 0, 0])
+            for i, value in enumerate(deltas):
+                merged[i] += value
+            self._futures.append(future)
+            self._stats["operations"] += 1
+            if self._first_queued is None:
+                self._first_queued = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="counter-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._first_queued is None:
+                        self._cond.wait()
+                        continue
+                    if len(self._futures) >= self.batch_size:
+                        break
+                    remaining = self._first_queued + self.interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self.flush()
+
+    def flush(self):
+        """Commits everything queued so far. Returns the number of operations applied."""
+        with self._flush_lock:
+            with self._cond:
+                deltas, futures = self._deltas, self._futures
+                self._deltas, self._futures, self._first_queued = {}, [], None
+            if not futures:
+                return 0
+            try:
+                with _conn() as con:
+                    # Like catch_character, a delta for someone without a users row creates it
+                    con.executemany("INSERT OR IGNORE INTO users (user_id) VALUES (?)", [(user_id,) for user_id in deltas])
+                    con.executemany(
+                        "UPDATE users SET coins=MAX(0,coins+?), catches=catches+?, wins=wins+?, losses=losses+? WHERE user_id=?",
+                        [(*d, user_id) for user_id, d in deltas.items()]
+                    )
+            except Exception as e:
+                with self._cond:
+                    self._stats["errors"] += 1
+                for future in futures:
+                    future.set_exception(e)
+                return 0
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["rows_written"] += len(deltas)
+            for future in futures:
+                future.set_result(True)
+            _mark_dirty()
+            return len(futures)
+
+    def metrics(self):
+        with self._cond:
+            return dict(self._stats, pending=len(self._futures))
+
+_counters = _CounterBatcher(config.COUNTER_FLUSH_MS, config.COUNTER_BATCH_SIZE)
+
+def queue_counters(user_id, coins=0, catches=0, wins=0, losses=0):
+    """
+    Queues counter deltas for group commit and returns a concurrent.futures.Future
+    that resolves once they are durable. Coins are merged before the MAX(0, ...)
+    clamp, so only the net delta per batch is clamped. A missing users row is
+    created rather than the delta being dropped.
+    """
+    return _counters.queue(user_id, (coins, catches, wins, losses))
+
+def flush_counters():
+    """Commits any queued counter deltas immediately."""
+    return _counters.flush()
+
+def counter_metrics():
+    """Counters for the group-commit writer: operations, batches, rows_written, errors, pending."""
+    return _counters.metrics()
+
+atexit.register(flush_counters)
 
 # ── Collections ─────────────────────────────────────────────────────────────
+# Two storage models: one `collections` row per copy (default), or one
+# `collection_counts` row per (user, character) when config.COMPACT_COLLECTIONS
+# is set. init_db() converts existing rows when the setting changes. Reads
+# return the same columns either way, with `count` = copies the row stands for.
+def _insert_copy(con, user_id, char_id):
+    if config.COMPACT_COLLECTIONS:
+        con.execute("""
+            INSERT INTO collection_counts (user_id,char_id) VALUES (?,?)
+            ON CONFLICT(user_id,char_id) DO UPDATE SET count=count+1, last_caught=datetime('now')
+        """, (user_id, char_id))
+    else:
+        con.execute("INSERT INTO collections (user_id,char_id) VALUES (?,?)", (user_id, char_id))
+
 def add_to_collection(user_id, char_id):
     with _conn() as con:
-        con.execute("INSERT INTO collections (user_id,char_id) VALUES (?,?)", (user_id, char_id))
-    sync_to_json()
+        _insert_copy(con, user_id, char_id)
+    _mark_dirty()
 
 def get_collection(user_id, page=0, per_page=10):
     offset = page * per_page
     with _conn() as con:
+        if config.COMPACT_COLLECTIONS:
+            return con.execute("""
+                SELECT c.id as col_id,c.char_id,ch.name,ch.anime,ch.rarity,ch.image_url,ch.is_custom,c.count
+                FROM collection_counts c JOIN characters ch ON ch.id=c.char_id
+                WHERE c.user_id=? ORDER BY c.sort_group,c.sort_rarity,c.sort_name,c.id LIMIT ? OFFSET ?
+            """, (user_id, per_page, offset)).fetchall()
         return con.execute("""
-            SELECT c.id as col_id,c.char_id,ch.name,ch.anime,ch.rarity,ch.image_url,ch.is_custom
+            SELECT c.id as col_id,c.char_id,ch.name,ch.anime,ch.rarity,ch.image_url,ch.is_custom,1 as count
             FROM collections c JOIN characters ch ON ch.id=c.char_id
-            WHERE c.user_id=? ORDER BY ch.is_custom DESC,ch.rarity,ch.name LIMIT ? OFFSET ?
+            WHERE c.user_id=? ORDER BY c.sort_group,c.sort_rarity,c.sort_name,c.id LIMIT ? OFFSET ?
         """, (user_id, per_page, offset)).fetchall()
 
-def get_full_collection(user_id):
+def collection_cursor(row):
+    """Keyset cursor for a collection row: pass it as `after` to fetch the next page."""
+    return (1 - row["is_custom"], row["rarity"], row["name"], row["col_id"])
+
+def get_collection_page(user_id, after=None, per_page=10):
+    """
+    Keyset pagination over (is_custom DESC, rarity, name, col_id). `after` is
+    the collection_cursor() of the previous page's last row, None for page one.
+    Every page is an index range scan, however deep it is.
+    """
+    if after is None:
+        # Sorts before every real key (sort_group is 0 or 1)
+        after = (-1, "", "", 0)
     with _conn() as con:
+        if config.COMPACT_COLLECTIONS:
+            return con.execute("""
+                SELECT c.id as col_id,c.char_id,ch.name,ch.anime,ch.rarity,ch.image_url,ch.is_custom,c.count
+                FROM collection_counts c JOIN characters ch ON ch.id=c.char_id
+                WHERE c.user_id=? AND (c.sort_group,c.sort_rarity,c.sort_name,c.id) > (?,?,?,?)
+                ORDER BY c.sort_group,c.sort_rarity,c.sort_name,c.id LIMIT ?
+            """, (user_id, *after, per_page)).fetchall()
         return con.execute("""
-            SELECT c.id as col_id,c.char_id,ch.name,ch.anime,ch.rarity,ch.image_url,ch.is_custom
+            SELECT c.id as col_id,c.char_id,ch.name,ch.anime,ch.rarity,ch.image_url,ch.is_custom,1 as count
             FROM collections c JOIN characters ch ON ch.id=c.char_id
-            WHERE c.user_id=? ORDER BY ch.is_custom DESC,ch.rarity,ch.name
-        """, (user_id,)).fetchall()
+            WHERE c.user_id=? AND (c.sort_group,c.sort_rarity,c.sort_name,c.id) > (?,?,?,?)
+            ORDER BY c.sort_group,c.sort_rarity,c.sort_name,c.id LIMIT ?
+        """, (user_id, *after, per_page)).fetchall()
+
+def iter_collection(user_id, chunk_size=500):
+    """Yields a user's whole collection in lists of at most chunk_size rows."""
+    after = None
+    while True:
+        chunk = get_collection_page(user_id, after, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        after = collection_cursor(chunk[-1])
+
+def get_full_collection(user_id):
+    return [row for chunk in iter_collection(user_id) for row in chunk]
 
 def count_collection(user_id):
     with _conn() as con:
+        if config.COMPACT_COLLECTIONS:
+            return con.execute("SELECT COALESCE(SUM(count),0) FROM collection_counts WHERE user_id=?", (user_id,)).fetchone()[0]
         return con.execute("SELECT COUNT(*) FROM collections WHERE user_id=?", (user_id,)).fetchone()[0]
 
+def count_copies(user_id, char_id):
+    with _conn() as con:
+        if config.COMPACT_COLLECTIONS:
+            row = con.execute("SELECT count FROM collection_counts WHERE user_id=? AND char_id=?", (user_id, char_id)).fetchone()
+            return row[0] if row else 0
+        return con.execute("SELECT COUNT(*) FROM collections WHERE user_id=? AND char_id=?", (user_id, char_id)).fetchone()[0]
+
 def has_character(user_id, char_id):
     with _conn() as con:
+        if config.COMPACT_COLLECTIONS:
+            return con.execute("SELECT 1 FROM collection_counts WHERE user_id=? AND char_id=?", (user_id, char_id)).fetchone() is not None
         return con.execute("SELECT 1 FROM collections WHERE user_id=? AND char_id=?", (user_id, char_id)).fetchone() is not None
 
+def _take_copy(con, user_id, char_id):
+    if config.COMPACT_COLLECTIONS:
+        if con.execute("UPDATE collection_counts SET count=count-1 WHERE user_id=? AND char_id=? AND count>1", (user_id, char_id)).rowcount:
+            return True
+        return con.execute("DELETE FROM collection_counts WHERE user_id=? AND char_id=?", (user_id, char_id)).rowcount > 0
+    row = con.execute("SELECT id FROM collections WHERE user_id=? AND char_id=? LIMIT 1", (user_id, char_id)).fetchone()
+    if not row: return False
+    con.execute("DELETE FROM collections WHERE id=?", (row["id"],))
+    return True
+
 def remove_from_collection(user_id, char_id):
     with _conn() as con:
-        row = con.execute("SELECT id FROM collections WHERE user_id=? AND char_id=? LIMIT 1", (user_id, char_id)).fetchone()
-        if not row: return False
-        con.execute("DELETE FROM collections WHERE id=?", (row["id"],))
-        return True
+        return _take_copy(con, user_id, char_id)
+
+def burn_duplicates(user_id, char_id):
+    """
+    Keeps one copy of char_id, burns the rest for BURN_COIN_VALUE coins each.
+    Returns the number of copies burned.
+    """
+    con = _conn()
+    with con:
+        con.execute("BEGIN IMMEDIATE")
+        if config.COMPACT_COLLECTIONS:
+            row = con.execute("SELECT count FROM collection_counts WHERE user_id=? AND char_id=?", (user_id, char_id)).fetchone()
+            burned = row[0] - 1 if row else 0
+            if burned > 0:
+                con.execute("UPDATE collection_counts SET count=1 WHERE user_id=? AND char_id=?", (user_id, char_id))
+        else:
+            burned = con.execute("""
+                DELETE FROM collections WHERE user_id=? AND char_id=?
+                AND id > (SELECT MIN(id) FROM collections WHERE user_id=? AND char_id=?)
+            """, (user_id, char_id, user_id, char_id)).rowcount
+        if burned > 0:
+            con.execute("UPDATE users SET coins=coins+? WHERE user_id=?", (burned * config.BURN_COIN_VALUE, user_id))
+    if burned > 0:
+        _mark_dirty()
+    return burned
 
 # ── Active Spawns ──────────────────────────────────────────────────────────
 def set_spawn(group_id, char_id, message_id):
@@ -320,35 +1541,575 @@ def clear_spawn(group_id):
     with _conn() as con:
         con.execute("DELETE FROM active_spawns WHERE group_id=?", (group_id,))
 
+def clear_spawns(group_ids):
+    with _conn() as con:
+        con.executemany("DELETE FROM active_spawns WHERE group_id=?", [(g,) for g in group_ids])
+
+def get_active_spawns():
+    """Every journalled spawn, for rebuilding the in-memory registry after a restart."""
+    with _conn() as con:
+        return con.execute("SELECT * FROM active_spawns").fetchall()
+
+# ── Catching ──────────────────────────────────────────────────────────────
+def _milestone_level(catches):
+    return sum(1 for threshold in config.CATCH_MILESTONES if catches >= threshold)
+
+def catch_character(group_id, user_id):
+    """
+    Catches the active spawn in group_id for user_id as a single transaction.
+    The conditional UPDATE on active_spawns means exactly one concurrent caller
+    wins; everyone else gets status "already_caught".
+    Returns {"status": "caught" | "already_caught" | "expired" | "no_spawn", ...},
+    with char_id, catches, coins, milestone_level and milestone_reached on success.
+    """
+    con = _conn()
+    with con:
+        con.execute("BEGIN IMMEDIATE")
+        claimed = con.execute("""
+            UPDATE active_spawns SET caught_by=?
+            WHERE group_id=? AND caught_by IS NULL AND spawned_at >= datetime('now', ?)
+        """, (user_id, group_id, f"-{config.CATCH_WINDOW_SEC} seconds")).rowcount
+        spawn = con.execute("SELECT char_id, caught_by FROM active_spawns WHERE group_id=?", (group_id,)).fetchone()
+        if not claimed:
+            if spawn is None:
+                return {"status": "no_spawn"}
+            return {"status": "already_caught" if spawn["caught_by"] is not None else "expired"}
+
+        char_id = spawn["char_id"]
+        con.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+        _insert_copy(con, user_id, char_id)
+        con.execute("UPDATE users SET catches=catches+1, coins=coins+? WHERE user_id=?", (config.CATCH_COINS, user_id))
+        user = con.execute("SELECT catches, coins, milestone_level FROM users WHERE user_id=?", (user_id,)).fetchone()
+
+        level = _milestone_level(user["catches"])
+        milestone_reached = level > user["milestone_level"]
+        coins = user["coins"]
+        if milestone_reached:
+            bonus = (level - user["milestone_level"]) * config.MILESTONE_BONUS_COINS
+            con.execute("UPDATE users SET milestone_level=?, coins=coins+? WHERE user_id=?", (level, bonus, user_id))
+            coins += bonus
+    _mark_dirty()
+    return {
+        "status": "caught",
+        "char_id": char_id,
+        "catches": user["catches"],
+        "coins": coins,
+        "milestone_level": max(level, user["milestone_level"]),
+        "milestone_reached": milestone_reached,
+    }
+
+# ── Redeem Codes ──────────────────────────────────────────────────────────
+REDEEM_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"   # no 0/O or 1/I lookalikes
+REDEEM_MAX_ATTEMPTS = 5                                 # batches redrawn after a code clash before giving up
+
+def _random_code(length):
+    bits = secrets.randbits(5 * length)
+    return "".join(REDEEM_ALPHABET[(bits >> shift) & 31] for shift in range(0, 5 * length, 5))
+
+def _redeem_expiry(expires_in):
+    return None if expires_in is None else f"{int(expires_in):+d} seconds"
+
+def create_redeem_code(code, coins=0, char_id=None, max_uses=1, expires_in=None, created_by=None):
+    """Adds one code; expires_in is seconds from now (None = never). Returns False if the code exists."""
+    try:
+        with _conn() as con:
+            con.execute("""
+                INSERT INTO redeem_codes (code,coins,char_id,max_uses,created_by,expires_at)
+                VALUES (?,?,?,?,?,datetime('now', ?))
+            """, (code.upper(), coins, char_id, max_uses, created_by, _redeem_expiry(expires_in)))
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+def generate_redeem_codes(count, coins=0, char_id=None, max_uses=1, expires_in=None, created_by=None, length=10):
+    """
+    Inserts `count` random codes sharing one reward in a single transaction and
+    returns them. A clash with an existing code (1 in 32**length per code)
+    rolls the batch back and it is drawn again, up to REDEEM_MAX_ATTEMPTS times;
+    any other IntegrityError is raised straight away.
+    """
+    if not 0 <= count <= len(REDEEM_ALPHABET) ** length:
+        raise ValueError(f"can't draw {count} distinct codes of length {length}")
+    expiry = _redeem_expiry(expires_in)
+    for attempt in range(1, REDEEM_MAX_ATTEMPTS + 1):
+        codes = set()
+        while len(codes) < count:
+            codes.add(_random_code(length))
+        try:
+            with _conn() as con:
+                con.executemany("""
+                    INSERT INTO redeem_codes (code,coins,char_id,max_uses,created_by,expires_at)
+                    VALUES (?,?,?,?,?,datetime('now', ?))
+                """, ((code, coins, char_id, max_uses, created_by, expiry) for code in codes))
+        except sqlite3.IntegrityError as e:
+            if "redeem_codes.code" not in str(e) or attempt == REDEEM_MAX_ATTEMPTS:
+                raise
+            continue
+        return list(codes)
+
+def get_redeem_code(code):
+    with _conn() as con:
+        return con.execute("SELECT * FROM redeem_codes WHERE code=?", (code.upper(),)).fetchone()
+
+def redeem_code(code, user_id):
+    """
+    Redeems `code` for user_id as a single transaction. One conditional UPDATE
+    checks uses left, expiry and whether this user already redeemed it, so
+    concurrent callers can never push used_count past max_uses; the unique
+    (code, user_id) index on redeem_log backs up the per-user check.
+    Returns {"status": "redeemed" | "already_redeemed" | "exhausted" | "expired" | "not_found", ...},
+    with coins, char_id and the new coin balance on success.
+    """
+    code = code.strip().upper()
+    con = _conn()
+    with con:
+        con.execute("BEGIN IMMEDIATE")
+        claimed = con.execute("""
+            UPDATE redeem_codes SET used_count=used_count+1
+            WHERE code=? AND used_count < max_uses
+              AND (expires_at IS NULL OR expires_at > datetime('now'))
+              AND NOT EXISTS (SELECT 1 FROM redeem_log WHERE code=? AND user_id=?)
+        """, (code, code, user_id)).rowcount
+        row = con.execute("""
+            SELECT coins, char_id, used_count, max_uses, expires_at <= datetime('now') AS expired,
+                   EXISTS (SELECT 1 FROM redeem_log WHERE code=? AND user_id=?) AS redeemed
+            FROM redeem_codes WHERE code=?
+        """, (code, user_id, code)).fetchone()
+        if not claimed:
+            if row is None:
+                return {"status": "not_found"}
+            if row["redeemed"]:
+                return {"status": "already_redeemed"}
+            return {"status": "expired" if row["expired"] else "exhausted"}
+
+        con.execute("INSERT INTO redeem_log (code,user_id) VALUES (?,?)", (code, user_id))
+        con.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+        if row["coins"]:
+            con.execute("UPDATE users SET coins=coins+? WHERE user_id=?", (row["coins"], user_id))
+        if row["char_id"] is not None:
+            _insert_copy(con, user_id, row["char_id"])
+        balance = con.execute("SELECT coins FROM users WHERE user_id=?", (user_id,)).fetchone()[0]
+    _mark_dirty()
+    return {"status": "redeemed", "coins": row["coins"], "char_id": row["char_id"], "balance": balance}
+
 # ── Trades ────────────────────────────────────────────────────────────────
+# Escrow: create_trade takes the offered copy and coins from the sender, so a
+# character can't sit in two pending offers. accept_trade settles both sides
+# in one transaction; decline/cancel and expire_trades hand the escrow back.
+def _trade_cutoff(con):
+    return con.execute("SELECT datetime('now', ?)", (f"-{config.TRADE_EXPIRY_SEC} seconds",)).fetchone()[0]
+
+def _refund_trade(con, trade):
+    _insert_copy(con, trade["from_user"], trade["from_char_id"])
+    if trade["coins_offered"]:
+        con.execute("UPDATE users SET coins=coins+? WHERE user_id=?", (trade["coins_offered"], trade["from_user"]))
+
 def create_trade(from_user, to_user, from_char_id, to_char_id, coins):
-    with _conn() as con:
+    """
+    Opens a trade and moves from_char_id and `coins` out of from_user's
+    account into escrow. Returns the trade id, or None if from_user doesn't
+    own a free copy of the character, can't cover the coins, or the offer
+    is negative or below TRADE_MIN_COINS.
+    """
+    if coins < 0 or coins < config.TRADE_MIN_COINS:
+        return None
+    con = _conn()
+    with con:
+        con.execute("BEGIN IMMEDIATE")
+        if not _take_copy(con, from_user, from_char_id):
+            con.rollback()
+            return None
+        if coins and not con.execute("UPDATE users SET coins=coins-? WHERE user_id=? AND coins>=?", (coins, from_user, coins)).rowcount:
+            con.rollback()
+            return None
         cur = con.execute(
-            "INSERT INTO trades (from_user,to_user,from_char_id,to_char_id,coins_offered) VALUES (?,?,?,?,?)",
+            "INSERT INTO trades (from_user,to_user,from_char_id,to_char_id,coins_offered,escrow) VALUES (?,?,?,?,?,1)",
             (from_user, to_user, from_char_id, to_char_id, coins)
         )
-    sync_to_json()
+    _mark_dirty()
     return cur.lastrowid
 
 def get_trade(trade_id):
     with _conn() as con:
         return con.execute("SELECT * FROM trades WHERE id=?", (trade_id,)).fetchone()
 
+def accept_trade(trade_id, user_id):
+    """
+    Settles a pending trade addressed to user_id in one transaction: the
+    escrowed character and coins go to user_id, and to_char_id (if asked for)
+    moves from user_id to the sender.
+    Returns {"status": "accepted" | "not_found" | "not_pending" | "expired" | "missing_character"}.
+    """
+    con = _conn()
+    with con:
+        con.execute("BEGIN IMMEDIATE")
+        cutoff = _trade_cutoff(con)
+        claimed = con.execute("""
+            UPDATE trades SET status='accepted'
+            WHERE id=? AND to_user=? AND status='pending' AND escrow=1 AND created_at >= ?
+        """, (trade_id, user_id, cutoff)).rowcount
+        trade = con.execute("SELECT * FROM trades WHERE id=?", (trade_id,)).fetchone()
+        if not claimed:
+            if trade is None or trade["to_user"] != user_id:
+                return {"status": "not_found"}
+            if trade["status"] == "pending" and trade["escrow"]:
+                return {"status": "expired"}
+            return {"status": "not_pending"}
+        if trade["to_char_id"] is not None and not _take_copy(con, user_id, trade["to_char_id"]):
+            con.rollback()
+            return {"status": "missing_character"}
+
+        con.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+        _insert_copy(con, user_id, trade["from_char_id"])
+        if trade["coins_offered"]:
+            con.execute("UPDATE users SET coins=coins+? WHERE user_id=?", (trade["coins_offered"], user_id))
+        if trade["to_char_id"] is not None:
+            _insert_copy(con, trade["from_user"], trade["to_char_id"])
+    _mark_dirty()
+    return {"status": "accepted"}
+
+def decline_trade(trade_id, user_id):
+    """
+    Recipient declines or sender cancels a pending trade; the escrow goes
+    back to the sender. Returns the new status ("declined" / "cancelled") or None.
+    """
+    con = _conn()
+    with con:
+        con.execute("BEGIN IMMEDIATE")
+        trade = con.execute("SELECT * FROM trades WHERE id=? AND status='pending'", (trade_id,)).fetchone()
+        if trade is None or user_id not in (trade["from_user"], trade["to_user"]):
+            return None
+        status = "cancelled" if user_id == trade["from_user"] else "declined"
+        con.execute("UPDATE trades SET status=? WHERE id=?", (status, trade_id))
+        if trade["escrow"]:
+            _refund_trade(con, trade)
+    _mark_dirty()
+    return status
+
 def update_trade_status(trade_id, status):
+    """Raw status change with no escrow handling; prefer accept_trade/decline_trade."""
     with _conn() as con:
         con.execute("UPDATE trades SET status=? WHERE id=?", (status, trade_id))
-    sync_to_json()
+    _mark_dirty()
+
+def expire_trades():
+    """
+    Expires every pending trade older than TRADE_EXPIRY_SEC and returns the
+    escrow, a fixed number of set-based statements over the
+    (status, created_at) index however many trades are due. Returns the count.
+    """
+    con = _conn()
+    with con:
+        con.execute("BEGIN IMMEDIATE")
+        cutoff = _trade_cutoff(con)
+        con.execute("""
+            UPDATE users SET coins = users.coins + refund.total
+            FROM (
+                SELECT from_user, SUM(coins_offered) AS total FROM trades
+                WHERE status='pending' AND created_at < ? AND escrow=1 AND coins_offered > 0
+                GROUP BY from_user
+            ) AS refund
+            WHERE users.user_id = refund.from_user
+        """, (cutoff,))
+        if config.COMPACT_COLLECTIONS:
+            con.execute("""
+                INSERT INTO collection_counts (user_id, char_id, count)
+                    SELECT from_user, from_char_id, COUNT(*) FROM trades
+                    WHERE status='pending' AND created_at < ? AND escrow=1
+                    GROUP BY from_user, from_char_id
+                ON CONFLICT(user_id, char_id) DO UPDATE SET count = count + excluded.count
+            """, (cutoff,))
+        else:
+            con.execute("""
+                INSERT INTO collections (user_id, char_id)
+                SELECT from_user, from_char_id FROM trades
+                WHERE status='pending' AND created_at < ? AND escrow=1
+            """, (cutoff,))
+        expired = con.execute(
+            "UPDATE trades SET status='expired' WHERE status='pending' AND created_at < ?", (cutoff,)
+        ).rowcount
+    if expired:
+        _mark_dirty()
+    return expired
+
+# ── Broadcasts ────────────────────────────────────────────────────────────
+# One row per announcement; last_user_id is the resume point after a restart.
+def create_broadcast(text):
+    with _conn() as con:
+        return con.execute("INSERT INTO broadcasts (text) VALUES (?)", (text,)).lastrowid
+
+def get_broadcast(broadcast_id):
+    with _conn() as con:
+        return con.execute("SELECT * FROM broadcasts WHERE id=?", (broadcast_id,)).fetchone()
+
+def get_unfinished_broadcast():
+    with _conn() as con:
+        return con.execute("SELECT * FROM broadcasts WHERE status='running' ORDER BY id LIMIT 1").fetchone()
+
+def checkpoint_broadcast(broadcast_id, last_user_id, sent, failed):
+    """Records that every user id <= last_user_id has been handled; sent/failed are deltas."""
+    with _conn() as con:
+        con.execute(
+            "UPDATE broadcasts SET last_user_id=?, sent=sent+?, failed=failed+? WHERE id=?",
+            (last_user_id, sent, failed, broadcast_id)
+        )
+
+def finish_broadcast(broadcast_id, status="done"):
+    with _conn() as con:
+        con.execute(
+            "UPDATE broadcasts SET status=?, finished_at=datetime('now') WHERE id=?",
+            (status, broadcast_id)
+        )
 
 # ── Stats ─────────────────────────────────────────────────────────────────
+# Totals are kept current by the trg_stats_* triggers (migration 5).
 def get_stats():
     with _conn() as con:
-        return {
-            "total_users":      con.execute("SELECT COUNT(*) FROM users").fetchone()[0],
-            "total_characters": con.execute("SELECT COUNT(*) FROM characters WHERE is_custom=0").fetchone()[0],
-            "custom_waifus":    con.execute("SELECT COUNT(*) FROM characters WHERE is_custom=1").fetchone()[0],
-            "total_catches":    con.execute("SELECT SUM(catches) FROM users").fetchone()[0] or 0,
-            "total_trades":     con.execute("SELECT COUNT(*) FROM trades WHERE status='accepted'").fetchone()[0],
-        }
+        row = con.execute("""
+            SELECT total_users, total_characters, custom_waifus, total_catches, total_trades
+            FROM stats_counters WHERE id=1
+        """).fetchone()
+        return dict(row)
+
+def get_daily_stats(days=7):
+    """Per-day catches and new users for the last `days` days that saw activity, newest first."""
+    with _conn() as con:
+        return con.execute("SELECT day, catches, new_users FROM stats_daily ORDER BY day DESC LIMIT ?", (days,)).fetchall()
+
+# ── NDJSON Export / Import ────────────────────────────────────────────────
+# Portable dump of every table for moving the bot between hosts. One JSON
+# document per line: a header, then for each table a {"table", "columns"}
+# line followed by one array per row. Both directions stream, so memory
+# stays flat however big the database is. FTS indexes aren't exported;
+# their triggers rebuild them as characters are imported.
+NDJSON_FORMAT = "waifubot-ndjson"
+
+def _dump_tables(con):
+    """Exportable tables: real tables only, FTS shadow tables and the stats totals last."""
+    rows = con.execute("SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'").fetchall()
+    virtual = [name for name, sql in rows if sql.upper().startswith("CREATE VIRTUAL")]
+    tables = [name for name, sql in rows
+              if name not in virtual and not any(name.startswith(v + "_") for v in virtual)]
+    # stats_* are maintained by triggers during the import, then overwritten with the exported values
+    return sorted(tables, key=lambda name: name.startswith("stats_"))
+
+def _open_text(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def _encode_value(value):
+    if isinstance(value, bytes):
+        return {"$b64": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"can't export {type(value).__name__}")
+
+def _decode_row(row):
+    return [base64.b64decode(v["$b64"]) if isinstance(v, dict) else v for v in row]
+
+def export_ndjson(path):
+    """
+    Streams every table to `path` (gzip-compressed if it ends in .gz) from
+    one read snapshot, so the dump is consistent while the bot keeps
+    writing. Returns {table: rows written}.
+    """
+    con = _open_connection()
+    con.row_factory = None
+    counts = {}
+    try:
+        con.execute("BEGIN")
+        tables = _dump_tables(con)
+        with _open_text(path, "w") as out:
+            header = {"format": NDJSON_FORMAT, "version": 1, "exported_at": datetime.now(timezone.utc).isoformat(),
+                      "user_version": con.execute("PRAGMA user_version").fetchone()[0]}
+            out.write(json.dumps(header) + "\n")
+            for table in tables:
+                cur = con.execute(f'SELECT * FROM "{table}"')
+                out.write(json.dumps({"table": table, "columns": [c[0] for c in cur.description]}) + "\n")
+                n = 0
+                for row in cur:
+                    out.write(json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=_encode_value) + "\n")
+                    n += 1
+                counts[table] = n
+    finally:
+        con.rollback()
+        con.close()
+    return counts
+
+def _restore_daily_stats(con):
+    """Undoes what the trg_stats_* triggers added to stats_daily while rows were imported."""
+    con.execute("DELETE FROM stats_daily")
+    con.execute("INSERT INTO stats_daily SELECT * FROM temp.stats_daily_before")
+    con.execute("DROP TABLE temp.stats_daily_before")
+
+def _rebuild_character_search(con):
+    """
+    Re-syncs the FTS indexes with characters. INSERT OR REPLACE deletes the old
+    row without firing trg_*_delete (recursive_triggers is off), which would
+    leave stale terms behind for every replaced character.
+    """
+    tables = ["characters_fts"] + (["characters_trgm"] if _has_trigram_index(con) else [])
+    for table in tables:
+        con.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+def import_ndjson(path):
+    """
+    Loads an export_ndjson() dump in one transaction with batched
+    executemany, replacing rows that share a primary key. Foreign keys are
+    checked at commit, so table order doesn't matter. The target schema must
+    be at least as new as the exporter's. Importing users would count them
+    as today's new_users, so stats_daily is put back as it was before the
+    import and then takes the dumped days; the character search indexes are
+    rebuilt once the rows are in. Returns {table: rows imported}.
+    """
+    counts = {}
+    con = _conn()
+    with _open_text(path, "r") as src:
+        header = json.loads(src.readline() or "{}")
+        if header.get("format") != NDJSON_FORMAT:
+            raise ValueError(f"{path} is not a {NDJSON_FORMAT} export")
+        if header["user_version"] > len(MIGRATIONS):
+            raise ValueError(f"{path} comes from a newer schema (user_version {header['user_version']})")
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            con.execute("PRAGMA defer_foreign_keys=ON")
+            con.execute("DROP TABLE IF EXISTS temp.stats_daily_before")
+            con.execute("CREATE TEMP TABLE stats_daily_before AS SELECT * FROM stats_daily")
+            table, sql, batch = None, None, []
+            for line in src:
+                item = json.loads(line)
+                if isinstance(item, list):
+                    batch.append(_decode_row(item))
+                    if len(batch) >= config.NDJSON_IMPORT_BATCH:
+                        con.executemany(sql, batch)
+                        counts[table] += len(batch)
+                        batch = []
+                    continue
+                if batch:
+                    con.executemany(sql, batch)
+                    counts[table] += len(batch)
+                    batch = []
+                table, columns = item["table"], item["columns"]
+                if table == "stats_daily":
+                    _restore_daily_stats(con)
+                names = ",".join(f'"{c}"' for c in columns)
+                sql = f'INSERT OR REPLACE INTO "{table}" ({names}) VALUES ({",".join("?" * len(columns))})'
+                counts[table] = 0
+            if batch:
+                con.executemany(sql, batch)
+                counts[table] += len(batch)
+            if "stats_daily" not in counts:
+                _restore_daily_stats(con)
+            if "characters" in counts:
+                _rebuild_character_search(con)
+    _reset_caches()
+    _mark_dirty()
+    return counts
+
+# ── Query Plan Audit ──────────────────────────────────────────────────────
+# Functions that are expected to read whole tables (exports, admin listings).
+_FULL_SCAN_OK = {"_table_counts", "_dump_tables", "_fetch_all_characters", "_sync_collection_model", "get_all_user_ids", "get_active_spawns",
+                 "snapshot_weekly_leaderboard", "_has_trigram_index", "import_ndjson", "_restore_daily_stats"}
+
+def _audit_placeholders(con):
+    """
+    Every value an f-string query placeholder can take, keyed by the
+    interpolated expression. A query is checked once per combination.
+    """
+    return {
+        "metric": LEADERBOARD_METRICS,
+        "column": ("last_daily_at", "last_duel_at"),
+        "clause": ("name=?", "anime=?", "rarity=?", "image_url=?"),
+        "table": ("characters_fts", "characters_trgm") if _has_trigram_index(con) else ("characters_fts",),
+    }
+
+def _module_queries(placeholders):
+    """
+    Yields (function name, sql, unknown placeholders) for every SQL string
+    passed to execute(). f-strings are expanded with each combination from
+    `placeholders`; any other interpolation is returned as unknown.
+    """
+    import ast
+    import itertools
+    with open(__file__, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for func in ast.walk(tree):
+        if not isinstance(func, ast.FunctionDef):
+            continue
+        for node in ast.walk(func):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in ("execute", "executemany") and node.args):
+                continue
+            arg = node.args[0]
+            if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                parts = [arg.value]
+            elif isinstance(arg, ast.JoinedStr):
+                # literal text stays a str, each {expression} becomes a 1-tuple of its source
+                parts = [v.value if isinstance(v, ast.Constant) else (ast.unparse(v.value),) for v in arg.values]
+            else:
+                continue
+            if not parts or not isinstance(parts[0], str) or \
+                    parts[0].split(None, 1)[0].upper() not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+                continue
+            names = sorted({p[0] for p in parts if isinstance(p, tuple)})
+            unknown = [n for n in names if n not in placeholders]
+            if unknown:
+                yield func.name, "".join(p if isinstance(p, str) else "{" + p[0] + "}" for p in parts), unknown
+                continue
+            for combo in itertools.product(*(placeholders[n] for n in names)):
+                values = dict(zip(names, combo))
+                yield func.name, "".join(p if isinstance(p, str) else values[p[0]] for p in parts).strip(), []
+
+def audit_query_plans():
+    """
+    Runs EXPLAIN QUERY PLAN on every query in this module, f-strings included,
+    and returns (function, sql, problem) for each full table scan, or each
+    placeholder _audit_placeholders() doesn't cover, outside _FULL_SCAN_OK.
+    """
+    problems = []
+    with _conn() as con:
+        for name, sql, unknown in _module_queries(_audit_placeholders(con)):
+            if name in _FULL_SCAN_OK:
+                continue
+            if unknown:
+                problems.append((name, sql, f"unchecked placeholders: {', '.join(unknown)}"))
+                continue
+            params = (None,) * sql.count("?")
+            details = [row["detail"] for row in con.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+            # Scanning a subquery result that was already built from index searches is fine
+            materialized = {d.split(" ", 1)[1] for d in details if d.startswith("MATERIALIZE ")}
+            for detail in details:
+                if detail.startswith("SCAN ") and not any(ok in detail for ok in ("USING", "VIRTUAL TABLE", "CONSTANT ROW")) \
+                        and detail[5:] not in materialized:
+                    problems.append((name, sql, detail))
+    return problems
 
 # Initial Startup
-init_db()
\ No newline at end of file
+init_db()
+
+if __name__ == "__main__":
+    # `python database.py` doubles as the query plan check, plus snapshot tools:
+    #   python database.py snapshot | snapshots | restore <file> | export <file> | import <file>
+    import sys
+    command = sys.argv[1] if len(sys.argv) > 1 else "audit"
+    if command == "snapshot":
+        print(f"✅ {snapshot_now()}")
+    elif command == "snapshots":
+        for path in list_snapshots():
+            print(f"{os.path.getsize(path):>12}  {path}")
+    elif command == "restore" and len(sys.argv) == 3:
+        counts = restore_snapshot(sys.argv[2])
+        print(f"✅ Restored {sys.argv[2]} (verified): " + ", ".join(f"{t}={n}" for t, n in counts.items()))
+    elif command == "export" and len(sys.argv) == 3:
+        counts = export_ndjson(sys.argv[2])
+        print(f"✅ Exported {sum(counts.values())} rows from {len(counts)} tables to {sys.argv[2]}")
+    elif command == "import" and len(sys.argv) == 3:
+        counts = import_ndjson(sys.argv[2])
+        print(f"✅ Imported {sum(counts.values())} rows into {len(counts)} tables from {sys.argv[2]}")
+    elif command == "audit":
+        problems = audit_query_plans()
+        for name, sql, detail in problems:
+            print(f"❌ {name}: {detail}\n   {' '.join(sql.split())}")
+        print("✅ No full table scans." if not problems else f"{len(problems)} full table scan(s).")
+        sys.exit(1 if problems else 0)
+    else:
+        sys.exit("usage: python database.py [audit | snapshot | snapshots | restore <file> | export <file> | import <file>]")
@@ -14,6 +14,7 @@ import logging
 import random
 import sqlite3
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 
 import requests
@@ -459,13 +460,26 @@ def db_set_last_score(match_id, score):
     con.execute("INSERT OR REPLACE INTO last_scores VALUES (?,?)", (match_id, score))
     con.commit(); con.close()
 
+# Handlers never call the db_* helpers directly: reads go to a small pool,
+# writes are serialised on one thread, so a slow commit can't stall the loop.
+_DB_READERS = ThreadPoolExecutor(max_workers=4, thread_name_prefix="db-read")
+_DB_WRITER  = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+
+async def db_read(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_DB_READERS, lambda: fn(*args, **kwargs))
+
+async def db_write(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_DB_WRITER, lambda: fn(*args, **kwargs))
+
 
 # ─────────────────────────────────────────────
 #  IPL COMMAND HANDLERS (using scraper)
 # ─────────────────────────────────────────────
 async def cmd_start(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    db_ensure_player(update.effective_chat.id, user.username or user.first_name)
+    await db_write(db_ensure_player, update.effective_chat.id, user.username or user.first_name)
     keyboard = [
         [InlineKeyboardButton("🔴 Live Scores", callback_data="score"),
          InlineKeyboardButton("📅 Today's Matches", callback_data="today")],
@@ -561,16 +575,16 @@ async def cmd_subscribe(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if team not in TEAM_NAMES:
         await msg.reply_text(f"❌ Unknown team code. Try: {', '.join(TEAM_NAMES)}")
         return
-    db_subscribe(update.effective_chat.id, team, update.effective_user.username or "")
+    await db_write(db_subscribe, update.effective_chat.id, team, update.effective_user.username or "")
     await msg.reply_text(f"✅ *Subscribed to {TEAM_NAMES[team]} alerts!*\n\nYou'll receive live score updates.", parse_mode="Markdown")
 
 async def cmd_unsubscribe(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    cur = db_get_subscription(chat_id)
+    cur = await db_read(db_get_subscription, chat_id)
     if not cur:
         await update.message.reply_text("ℹ️ You are not subscribed to any alerts.")
         return
-    db_unsubscribe(chat_id)
+    await db_write(db_unsubscribe, chat_id)
     await update.message.reply_text(f"🔕 *Unsubscribed from {TEAM_NAMES.get(cur, cur)} alerts.*", parse_mode="Markdown")
 
 async def cmd_help(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
@@ -619,13 +633,13 @@ def number_keyboard():
 async def cmd_play(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user = update.effective_user
-    db_ensure_player(chat_id, user.username or user.first_name)
-    db_delete_game(chat_id)
+    await db_write(db_ensure_player, chat_id, user.username or user.first_name)
+    await db_write(db_delete_game, chat_id)
 
     toss_result = random.choice(["player", "bot"])
     if toss_result == "player":
-        db_set_game(chat_id, role="", phase="", player_runs=0, bot_runs=0,
-                    player_wickets=0, bot_wickets=0, balls_played=0, target=0, state="toss_player")
+        await db_write(db_set_game, chat_id, role="", phase="", player_runs=0, bot_runs=0,
+                       player_wickets=0, bot_wickets=0, balls_played=0, target=0, state="toss_player")
         toss_message = "*🎲 COIN TOSS*\n\n🪙 *You won the toss!*\n\nChoose to bat or bowl first:"
         keyboard = InlineKeyboardMarkup([
             [InlineKeyboardButton("🏏 Bat First", callback_data="toss_bat"),
@@ -635,19 +649,19 @@ async def cmd_play(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
             toss_message, parse_mode="Markdown", reply_markup=keyboard
         )
     else:
-        db_set_game(chat_id, role="", phase="", player_runs=0, bot_runs=0,
-                    player_wickets=0, bot_wickets=0, balls_played=0, target=0, state="toss_bot")
+        await db_write(db_set_game, chat_id, role="", phase="", player_runs=0, bot_runs=0,
+                       player_wickets=0, bot_wickets=0, balls_played=0, target=0, state="toss_bot")
         toss_message = "*🎲 COIN TOSS*\n\n🤖 *Bot won the toss!*\n\nBot chooses to bat or bowl..."
         bot_choice = random.choice(["bat", "bowl"])
         if bot_choice == "bat":
-            db_set_game(chat_id, role="bowl", phase="bowling", state="playing")
+            await db_write(db_set_game, chat_id, role="bowl", phase="bowling", state="playing")
             await (update.message or update.callback_query.message).reply_text(
                 f"{toss_message}\n\n🤖 Bot chooses to *BAT first*!\n\n🎳 You will bowl first. Pick your delivery (1–6):",
                 parse_mode="Markdown",
                 reply_markup=number_keyboard(),
             )
         else:
-            db_set_game(chat_id, role="bat", phase="batting", state="playing")
+            await db_write(db_set_game, chat_id, role="bat", phase="batting", state="playing")
             await (update.message or update.callback_query.message).reply_text(
                 f"{toss_message}\n\n🤖 Bot chooses to *BOWL first*!\n\n🏏 You will bat first. Pick your shot (1–6):",
                 parse_mode="Markdown",
@@ -656,11 +670,11 @@ async def cmd_play(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
 async def cmd_bat(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    game = db_get_game(chat_id)
+    game = await db_read(db_get_game, chat_id)
     if not game:
         await update.message.reply_text("❌ No active game. Use /play to start!")
         return
-    db_set_game(chat_id, role="bat", phase="batting", state="playing")
+    await db_write(db_set_game, chat_id, role="bat", phase="batting", state="playing")
     await update.message.reply_text(
         "*🏏 You chose to BAT first!*\n\nPick your shot:",
         parse_mode="Markdown",
@@ -669,11 +683,11 @@ async def cmd_bat(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
 async def cmd_bowl(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    game = db_get_game(chat_id)
+    game = await db_read(db_get_game, chat_id)
     if not game:
         await update.message.reply_text("❌ No active game. Use /play to start!")
         return
-    db_set_game(chat_id, role="bowl", phase="bowling", state="playing")
+    await db_write(db_set_game, chat_id, role="bowl", phase="bowling", state="playing")
     await update.message.reply_text(
         "*🎳 You chose to BOWL first!*\n\nPick your delivery:",
         parse_mode="Markdown",
@@ -694,7 +708,7 @@ async def cmd_shoot(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 async def process_shot(update: Update, ctx: ContextTypes.DEFAULT_TYPE, player_pick: int, via_callback=False):
     chat_id = update.effective_chat.id
     msg = update.message if not via_callback else update.callback_query.message
-    game = db_get_game(chat_id)
+    game = await db_read(db_get_game, chat_id)
     if not game or game[9] != "playing":
         await msg.reply_text("❌ No active game. Use /play to start!")
         return
@@ -721,7 +735,7 @@ async def process_shot(update: Update, ctx: ContextTypes.DEFAULT_TYPE, player_pi
             shot_com = random.choice(SHOT_COMMENTARY.get(player_pick, ["Good shot!"]))
             response_lines.append(f"✅ {shot_com} *+{player_pick} runs*")
         balls_played += 1
-        db_set_game(chat_id, player_runs=player_runs, player_wickets=player_wickets, balls_played=balls_played)
+        await db_write(db_set_game, chat_id, player_runs=player_runs, player_wickets=player_wickets, balls_played=balls_played)
         if balls_played >= MAX_OVERS * 6:
             response_lines.append(f"\n⏱ *Innings Over!* Your score: *{player_runs}/{player_wickets}* ({overs_str(balls_played)} ov)")
             await msg.reply_text("\n".join(response_lines), parse_mode="Markdown")
@@ -751,12 +765,12 @@ async def process_shot(update: Update, ctx: ContextTypes.DEFAULT_TYPE, player_pi
             else:
                 response_lines.append(f"🤖 Bot scores {bot_pick} runs.")
         if target > 0 and bot_runs > target:
-            db_set_game(chat_id, bot_runs=bot_runs, bot_wickets=bot_wickets, balls_played=balls_played)
+            await db_write(db_set_game, chat_id, bot_runs=bot_runs, bot_wickets=bot_wickets, balls_played=balls_played)
             await msg.reply_text("\n".join(response_lines), parse_mode="Markdown")
             await end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wickets, role)
             return
         balls_played += 1
-        db_set_game(chat_id, bot_runs=bot_runs, bot_wickets=bot_wickets, balls_played=balls_played)
+        await db_write(db_set_game, chat_id, bot_runs=bot_runs, bot_wickets=bot_wickets, balls_played=balls_played)
         if balls_played >= MAX_OVERS * 6:
             response_lines.append(f"\n⏱ *Bot Innings Over!* Bot: *{bot_runs}/{bot_wickets}* ({overs_str(balls_played)} ov)")
             await msg.reply_text("\n".join(response_lines), parse_mode="Markdown")
@@ -779,7 +793,7 @@ async def process_shot(update: Update, ctx: ContextTypes.DEFAULT_TYPE, player_pi
             response_lines.append(f"💥 *OUT!* ({player_wickets}/{MAX_WICKETS} wickets)")
             if player_wickets >= MAX_WICKETS:
                 response_lines.append(f"🏏 *All Out!* You scored: *{player_runs}/{player_wickets}*")
-                db_set_game(chat_id, player_runs=player_runs, player_wickets=player_wickets, balls_played=balls_played)
+                await db_write(db_set_game, chat_id, player_runs=player_runs, player_wickets=player_wickets, balls_played=balls_played)
                 await msg.reply_text("\n".join(response_lines), parse_mode="Markdown")
                 await end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wickets, role)
                 return
@@ -788,13 +802,13 @@ async def process_shot(update: Update, ctx: ContextTypes.DEFAULT_TYPE, player_pi
             shot_com = random.choice(SHOT_COMMENTARY.get(player_pick, ["Good shot!"]))
             response_lines.append(f"✅ {shot_com} *+{player_pick}*")
             if player_runs > target:
-                db_set_game(chat_id, player_runs=player_runs, player_wickets=player_wickets)
+                await db_write(db_set_game, chat_id, player_runs=player_runs, player_wickets=player_wickets)
                 response_lines.append(f"\n🎉 *YOU WIN!* You reached the target!")
                 await msg.reply_text("\n".join(response_lines), parse_mode="Markdown")
                 await end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wickets, role)
                 return
         balls_played += 1
-        db_set_game(chat_id, player_runs=player_runs, player_wickets=player_wickets, balls_played=balls_played)
+        await db_write(db_set_game, chat_id, player_runs=player_runs, player_wickets=player_wickets, balls_played=balls_played)
         if balls_played >= MAX_OVERS * 6:
             await msg.reply_text("\n".join(response_lines), parse_mode="Markdown")
             await end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wickets, role)
@@ -811,7 +825,7 @@ async def process_shot(update: Update, ctx: ContextTypes.DEFAULT_TYPE, player_pi
             bot_wickets += 1
             response_lines.append(f"💥 *WICKET!* Bot: {bot_wickets}/{MAX_WICKETS}")
             if bot_wickets >= MAX_WICKETS:
-                db_set_game(chat_id, bot_wickets=bot_wickets)
+                await db_write(db_set_game, chat_id, bot_wickets=bot_wickets)
                 await msg.reply_text("\n".join(response_lines), parse_mode="Markdown")
                 await end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wickets, role)
                 return
@@ -824,13 +838,13 @@ async def process_shot(update: Update, ctx: ContextTypes.DEFAULT_TYPE, player_pi
             else:
                 response_lines.append(f"🤖 Bot scores {bot_pick} runs.")
             if bot_runs > target:
-                db_set_game(chat_id, bot_runs=bot_runs, bot_wickets=bot_wickets)
+                await db_write(db_set_game, chat_id, bot_runs=bot_runs, bot_wickets=bot_wickets)
                 response_lines.append("\n🤖 *Bot reaches the target!*")
                 await msg.reply_text("\n".join(response_lines), parse_mode="Markdown")
                 await end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wickets, role)
                 return
         balls_played += 1
-        db_set_game(chat_id, bot_runs=bot_runs, bot_wickets=bot_wickets, balls_played=balls_played)
+        await db_write(db_set_game, chat_id, bot_runs=bot_runs, bot_wickets=bot_wickets, balls_played=balls_played)
         if balls_played >= MAX_OVERS * 6:
             await msg.reply_text("\n".join(response_lines), parse_mode="Markdown")
             await end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wickets, role)
@@ -845,7 +859,7 @@ async def process_shot(update: Update, ctx: ContextTypes.DEFAULT_TYPE, player_pi
 async def start_second_innings(msg, chat_id, player_runs, player_wickets, bot_runs, bot_wickets, balls_played, role):
     if role == "bat":
         target = player_runs
-        db_set_game(chat_id, phase="bowling2", balls_played=0, target=target, bot_runs=0, bot_wickets=0, state="playing")
+        await db_write(db_set_game, chat_id, phase="bowling2", balls_played=0, target=target, bot_runs=0, bot_wickets=0, state="playing")
         need = target + 1
         await msg.reply_text(
             f"🔄 *SECOND INNINGS - Bot Chasing*\n\n"
@@ -857,7 +871,7 @@ async def start_second_innings(msg, chat_id, player_runs, player_wickets, bot_ru
         )
     else:
         target = bot_runs
-        db_set_game(chat_id, phase="batting2", balls_played=0, target=target, player_runs=0, player_wickets=0, state="playing")
+        await db_write(db_set_game, chat_id, phase="batting2", balls_played=0, target=target, player_runs=0, player_wickets=0, state="playing")
         need = target + 1
         await msg.reply_text(
             f"🔄 *SECOND INNINGS - You Chase*\n\n"
@@ -869,9 +883,9 @@ async def start_second_innings(msg, chat_id, player_runs, player_wickets, bot_ru
         )
 
 async def end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wickets, role):
-    db_delete_game(chat_id)
-    win_sp = int(db_get_setting("win_skill_points") or DEFAULT_WIN_SKILL_POINTS)
-    win_yen = int(db_get_setting("win_yen") or DEFAULT_WIN_YEN)
+    await db_write(db_delete_game, chat_id)
+    win_sp = int(await db_read(db_get_setting, "win_skill_points") or DEFAULT_WIN_SKILL_POINTS)
+    win_yen = int(await db_read(db_get_setting, "win_yen") or DEFAULT_WIN_YEN)
 
     player_won = player_runs > bot_runs
     margin = abs(player_runs - bot_runs)
@@ -884,7 +898,7 @@ async def end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wick
     )
 
     if player_won:
-        db_add_win(chat_id, win_sp, win_yen, player_runs, player_wickets)
+        await db_write(db_add_win, chat_id, win_sp, win_yen, player_runs, player_wickets)
         result = (
             f"*🎉 VICTORY!*\n\n"
             f"You win by *{margin}* runs!\n\n"
@@ -895,7 +909,7 @@ async def end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wick
             f"Check /profile for your total."
         )
     else:
-        db_add_loss(chat_id, player_runs, player_wickets)
+        await db_write(db_add_loss, chat_id, player_runs, player_wickets)
         result = (
             f"*😔 DEFEAT*\n\n"
             f"Bot wins by *{margin}* runs.\n\n"
@@ -916,16 +930,16 @@ async def end_game(msg, chat_id, player_runs, bot_runs, player_wickets, bot_wick
 async def cmd_profile(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     msg = update.message or update.callback_query.message
-    db_ensure_player(chat_id, update.effective_user.username or update.effective_user.first_name)
-    p = db_get_player(chat_id)
+    await db_write(db_ensure_player, chat_id, update.effective_user.username or update.effective_user.first_name)
+    p = await db_read(db_get_player, chat_id)
     if not p:
         await msg.reply_text("❌ Profile not found. Use /play to start playing!")
         return
     _, username, sp, yen, wins, losses, runs, wickets = p
     total = wins + losses
     wr = f"{wins/total*100:.1f}%" if total > 0 else "N/A"
-    win_sp = db_get_setting("win_skill_points") or DEFAULT_WIN_SKILL_POINTS
-    win_yen = db_get_setting("win_yen") or DEFAULT_WIN_YEN
+    win_sp = await db_read(db_get_setting, "win_skill_points") or DEFAULT_WIN_SKILL_POINTS
+    win_yen = await db_read(db_get_setting, "win_yen") or DEFAULT_WIN_YEN
     profile_text = (
         f"*👤 Player Profile: {username}*\n\n"
         f"⭐ Skill Points: *{sp}*\n"
@@ -943,7 +957,7 @@ async def cmd_profile(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
 async def cmd_leaderboard(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     msg = update.message or update.callback_query.message
-    rows = db_get_leaderboard()
+    rows = await db_read(db_get_leaderboard)
     if not rows:
         await msg.reply_text("🏆 *No players yet.* Be the first to play!", parse_mode="Markdown")
         return
@@ -958,8 +972,8 @@ async def cmd_leaderboard(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     await msg.reply_text("\n".join(lines), parse_mode="Markdown")
 
 async def cmd_rewards(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
-    sp = db_get_setting("win_skill_points") or DEFAULT_WIN_SKILL_POINTS
-    yen = db_get_setting("win_yen") or DEFAULT_WIN_YEN
+    sp = await db_read(db_get_setting, "win_skill_points") or DEFAULT_WIN_SKILL_POINTS
+    yen = await db_read(db_get_setting, "win_yen") or DEFAULT_WIN_YEN
     await (update.message or update.callback_query.message).reply_text(
         f"*🎁 Current Game Rewards*\n\n"
         f"🏆 *Win Reward*\n"
@@ -981,7 +995,7 @@ async def cmd_setreward(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /setreward [points]\nExample: /setreward 100")
         return
     pts = int(ctx.args[0])
-    db_set_setting("win_skill_points", pts)
+    await db_write(db_set_setting, "win_skill_points", pts)
     await update.message.reply_text(f"✅ *Win reward updated!*\n⭐ Skill Points per win: *{pts}*", parse_mode="Markdown")
 
 async def cmd_setyen(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
@@ -992,7 +1006,7 @@ async def cmd_setyen(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /setyen [amount]\nExample: /setyen 500")
         return
     yen = int(ctx.args[0])
-    db_set_setting("win_yen", yen)
+    await db_write(db_set_setting, "win_yen", yen)
     await update.message.reply_text(f"✅ *Win reward updated!*\n💴 Yen per win: *{yen}*", parse_mode="Markdown")
 
 
@@ -1015,15 +1029,15 @@ async def button_handler(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         buttons = [[InlineKeyboardButton(n, callback_data=f"sub_{c}")] for c, n in TEAM_NAMES.items()]
         await query.message.reply_text("🔔 *Select your team:*", parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(buttons))
     elif data == "quit_game":
-        db_delete_game(update.effective_chat.id)
+        await db_write(db_delete_game, update.effective_chat.id)
         await query.message.reply_text("❌ *Game cancelled.* Use /play to start a new match.", parse_mode="Markdown")
     elif data == "toss_bat":
         chat_id = update.effective_chat.id
-        game = db_get_game(chat_id)
+        game = await db_read(db_get_game, chat_id)
         if not game or game[9] != "toss_player":
             await query.message.reply_text("❌ No active toss. Use /play to start a new game.")
             return
-        db_set_game(chat_id, role="bat", phase="batting", state="playing")
+        await db_write(db_set_game, chat_id, role="bat", phase="batting", state="playing")
         await query.message.reply_text(
             "*🏏 You chose to BAT first!*\n\nPick your shot:",
             parse_mode="Markdown",
@@ -1031,11 +1045,11 @@ async def button_handler(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         )
     elif data == "toss_bowl":
         chat_id = update.effective_chat.id
-        game = db_get_game(chat_id)
+        game = await db_read(db_get_game, chat_id)
         if not game or game[9] != "toss_player":
             await query.message.reply_text("❌ No active toss. Use /play to start a new game.")
             return
-        db_set_game(chat_id, role="bowl", phase="bowling", state="playing")
+        await db_write(db_set_game, chat_id, role="bowl", phase="bowling", state="playing")
         await query.message.reply_text(
             "*🎳 You chose to BOWL first!*\n\nPick your delivery:",
             parse_mode="Markdown",
@@ -1048,7 +1062,7 @@ async def button_handler(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         team = data[4:]
         chat_id = update.effective_chat.id
         username = update.effective_user.username or ""
-        db_subscribe(chat_id, team, username)
+        await db_write(db_subscribe, chat_id, team, username)
         await query.message.reply_text(f"✅ *Subscribed to {TEAM_NAMES.get(team, team)} alerts!*", parse_mode="Markdown")
 
 
@@ -1056,7 +1070,7 @@ async def button_handler(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 #  AUTO-ALERT JOB
 # ─────────────────────────────────────────────
 async def alert_job(ctx: ContextTypes.DEFAULT_TYPE):
-    subscribers = db_get_all_subscribers()
+    subscribers = await db_read(db_get_all_subscribers)
     if not subscribers:
         return
 
@@ -1086,10 +1100,10 @@ async def alert_job(ctx: ContextTypes.DEFAULT_TYPE):
         batting_score = batting.get('score', [{}])[0] if batting.get('score') else {}
         bowling_score = bowling.get('score', [{}])[0] if bowling.get('score') else {}
         score_str = f"{batting.get('team')}:{batting_score.get('runs',0)}/{batting_score.get('wickets',0)}|{bowling.get('team')}:{bowling_score.get('runs',0)}/{bowling_score.get('wickets',0)}"
-        last = db_get_last_score(match_id)
+        last = await db_read(db_get_last_score, match_id)
 
         if match.get('mchstate') == 'result' and last != "ENDED":
-            db_set_last_score(match_id, "ENDED")
+            await db_write(db_set_last_score, match_id, "ENDED")
             try:
                 await ctx.bot.send_message(
                     chat_id=chat_id,
@@ -1101,7 +1115,7 @@ async def alert_job(ctx: ContextTypes.DEFAULT_TYPE):
             continue
 
         if score_str and score_str != last:
-            db_set_last_score(match_id, score_str)
+            await db_write(db_set_last_score, match_id, score_str)
             if last is None:
                 try:
                     await ctx.bot.send_message(
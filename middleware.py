@@ -0,0 +1,21 @@
+"""
+middleware.py – Update gates that run before any WaifuBot handler
+
+    import middleware
+    middleware.install(application)
+"""
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+
+import database
+
+async def drop_banned_users(update: Update, context):
+    """Stops processing of any update sent by a banned user (memory lookup only)."""
+    user = update.effective_user
+    if user is not None and database.is_banned(user.id):
+        raise ApplicationHandlerStop
+
+def install(application):
+    """Registers the gates in handler group -1, which runs before the default group 0."""
+    application.add_handler(TypeHandler(Update, drop_banned_users), group=-1)
@@ -0,0 +1,259 @@
+"""
+spawns.py – In-memory active spawn registry for WaifuBot
+Per-message questions ("is a character out?", "is this group cooling down?")
+are answered from memory. The active_spawns table is only a crash-recovery
+journal, written when a spawn actually happens and read back by recover().
+Uncaught spawns expire after CATCH_WINDOW_SEC through a hashed timer wheel.
+"""
+
+import math
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import config
+import database
+import async_db
+
+# ── Timer Wheel ───────────────────────────────────────────────────────────
+class TimerWheel:
+    """
+    Hashed timer wheel: schedule/cancel are O(1) and advance() only looks at
+    the slots for the ticks that passed. Deadlines further out than one
+    revolution simply stay in their slot until a later pass reaches them.
+    """
+
+    def __init__(self, tick=1.0, slots=256, now=None):
+        self.tick = tick
+        self._slots = [{} for _ in range(slots)]   # key -> deadline
+        self._slot_of = {}                          # key -> slot index
+        self._cursor = int((time.time() if now is None else now) // tick)
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def schedule(self, key, deadline):
+        self.cancel(key)
+        index = max(int(deadline // self.tick), self._cursor) % len(self._slots)
+        self._slots[index][key] = deadline
+        self._slot_of[key] = index
+
+    def cancel(self, key):
+        index = self._slot_of.pop(key, None)
+        if index is not None:
+            del self._slots[index][key]
+
+    def advance(self, now):
+        """Removes and returns every key whose deadline is <= now."""
+        target = int(now // self.tick)
+        first = max(self._cursor, target - len(self._slots) + 1)
+        expired = []
+        for t in range(first, target + 1):
+            slot = self._slots[t % len(self._slots)]
+            for key in [k for k, deadline in slot.items() if deadline <= now]:
+                del slot[key]
+                del self._slot_of[key]
+                expired.append(key)
+        # The current tick is revisited next time: it may hold later deadlines
+        self._cursor = target
+        return expired
+
+# ── Registry ──────────────────────────────────────────────────────────────
+class Spawn:
+    __slots__ = ("group_id", "char_id", "message_id", "spawned_at", "caught_by")
+
+    def __init__(self, group_id, char_id, message_id, spawned_at, caught_by=None):
+        self.group_id = group_id
+        self.char_id = char_id
+        self.message_id = message_id
+        self.spawned_at = spawned_at
+        self.caught_by = caught_by
+
+class SpawnRegistry:
+    """Active spawns and spawn cooldowns per group, all in memory."""
+
+    def __init__(self, catch_window=config.CATCH_WINDOW_SEC, cooldown=config.SPAWN_COOLDOWN_SEC, clock=time.time):
+        self.catch_window = catch_window
+        self.cooldown = cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._active = {}           # group_id -> Spawn
+        self._next_spawn = {}       # group_id -> earliest time the group may spawn again
+        self._wheel = TimerWheel(now=clock())
+
+    def __len__(self):
+        return len(self._active)
+
+    def get(self, group_id):
+        """The group's uncaught, unexpired spawn, or None."""
+        spawn = self._active.get(group_id)
+        if spawn is None or spawn.caught_by is not None:
+            return None
+        if spawn.spawned_at + self.catch_window < self.clock():
+            return None
+        return spawn
+
+    def can_spawn(self, group_id):
+        return self.get(group_id) is None and self._next_spawn.get(group_id, 0) <= self.clock()
+
+    def reserve(self, group_id):
+        """Atomically claims the group's next spawn slot and starts its cooldown."""
+        with self._lock:
+            if not self.can_spawn(group_id):
+                return False
+            self._next_spawn[group_id] = self.clock() + self.cooldown
+            return True
+
+    def add(self, group_id, char_id, message_id, spawned_at=None, caught_by=None):
+        spawned_at = self.clock() if spawned_at is None else spawned_at
+        with self._lock:
+            self._active[group_id] = Spawn(group_id, char_id, message_id, spawned_at, caught_by)
+            self._next_spawn[group_id] = max(self._next_spawn.get(group_id, 0), spawned_at + self.cooldown)
+            self._wheel.schedule(group_id, spawned_at + self.catch_window)
+
+    def check_catch(self, group_id):
+        """None if the group has a catchable spawn, otherwise the failure status."""
+        spawn = self._active.get(group_id)
+        if spawn is None:
+            return "no_spawn"
+        if spawn.caught_by is not None:
+            return "already_caught"
+        if spawn.spawned_at + self.catch_window < self.clock():
+            return "expired"
+        return None
+
+    def mark_caught(self, group_id, user_id):
+        with self._lock:
+            spawn = self._active.get(group_id)
+            if spawn is not None:
+                spawn.caught_by = user_id
+
+    def remove(self, group_id):
+        with self._lock:
+            self._wheel.cancel(group_id)
+            return self._active.pop(group_id, None)
+
+    def expire_due(self):
+        """
+        Drops every spawn whose catch window has closed and returns them;
+        callers only need to announce the ones with caught_by still None.
+        """
+        now = self.clock()
+        with self._lock:
+            due = [self._active.pop(g) for g in self._wheel.advance(now) if g in self._active]
+            for group_id in [g for g, t in self._next_spawn.items() if t <= now]:
+                del self._next_spawn[group_id]
+        return due
+
+registry = SpawnRegistry()
+
+# ── Scheduler ─────────────────────────────────────────────────────────────
+class SpawnScheduler:
+    """
+    Decides which group messages trigger a spawn without any I/O. Rather than
+    rolling SPAWN_CHANCE on every message, each group draws how many eligible
+    messages until its next spawn (geometric, so the odds per message are the
+    same) and just counts down. Messages during a cooldown or live spawn don't
+    count, matching a per-message roll that would be ignored then.
+
+    Senders are remembered and upserted in batches by flush_users().
+    """
+
+    def __init__(self, registry, chance=config.SPAWN_CHANCE, rng=None):
+        self.registry = registry
+        self.chance = chance
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._remaining = {}        # group_id -> eligible messages left before a spawn
+        self._pending_users = {}    # user_id -> (username, first_name)
+        self.messages = 0
+        self.spawns = 0
+
+    def _draw(self):
+        if self.chance >= 1:
+            return 1
+        if self.chance <= 0:
+            return math.inf
+        return int(math.log(1.0 - self.rng.random()) / math.log(1.0 - self.chance)) + 1
+
+    def on_message(self, group_id, user_id, username="", first_name=""):
+        """Returns True when this message should spawn (the group slot is already reserved)."""
+        with self._lock:
+            self.messages += 1
+            self._pending_users[user_id] = (username, first_name)
+            if not self.registry.can_spawn(group_id):
+                return False
+            remaining = self._remaining.get(group_id)
+            if remaining is None:
+                remaining = self._draw()
+            remaining -= 1
+            if remaining > 0:
+                self._remaining[group_id] = remaining
+                return False
+            self._remaining.pop(group_id, None)
+        if not self.registry.reserve(group_id):
+            return False
+        self.spawns += 1
+        return True
+
+    def take_pending_users(self):
+        with self._lock:
+            users, self._pending_users = self._pending_users, {}
+        return [(user_id, username, first_name) for user_id, (username, first_name) in users.items()]
+
+scheduler = SpawnScheduler(registry)
+
+def _journal_time(text):
+    """active_spawns.spawned_at ('YYYY-MM-DD HH:MM:SS', UTC) -> epoch seconds."""
+    return datetime.strptime(text, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+
+def recover():
+    """Rebuilds the registry from the active_spawns journal; call once at startup."""
+    for row in database.get_active_spawns():
+        registry.add(row["group_id"], row["char_id"], row["message_id"],
+                     spawned_at=_journal_time(row["spawned_at"]), caught_by=row["caught_by"])
+    return len(registry)
+
+# ── Async API for handlers ────────────────────────────────────────────────
+async def start_spawn(group_id, char_id, message_id):
+    """Records a spawn the bot has just posted (after registry.reserve())."""
+    registry.add(group_id, char_id, message_id)
+    await async_db.set_spawn(group_id, char_id, message_id)
+
+async def catch(group_id, user_id):
+    """
+    /catch: answered from memory unless there is a live spawn, in which case
+    database.catch_character() settles the race and records the catch.
+    """
+    status = registry.check_catch(group_id)
+    if status is not None:
+        return {"status": status}
+    result = await async_db.catch_character(group_id, user_id)
+    if result["status"] == "caught":
+        registry.mark_caught(group_id, user_id)
+    elif result["status"] in ("no_spawn", "expired"):
+        registry.remove(group_id)
+    return result
+
+async def expire_due():
+    """Expires closed spawns and clears their journal rows; returns the Spawns dropped."""
+    due = registry.expire_due()
+    if due:
+        await async_db.clear_spawns([spawn.group_id for spawn in due])
+    return due
+
+async def expiry_job(context):
+    """python-telegram-bot job callback, e.g. app.job_queue.run_repeating(expiry_job, interval=1)."""
+    await expire_due()
+
+async def flush_users():
+    """Upserts everyone who has chatted since the last flush in one transaction."""
+    users = scheduler.take_pending_users()
+    if users:
+        await async_db.ensure_users(users)
+    return len(users)
+
+async def flush_users_job(context):
+    """python-telegram-bot job callback, e.g. app.job_queue.run_repeating(flush_users_job, interval=config.USER_FLUSH_SEC)."""
+    await flush_users()
@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+import threading
+
+# database.py resolves its paths at import time, so point it at scratch space first
+os.environ.setdefault("WAIFUBOT_DATA_DIR", tempfile.mkdtemp(prefix="waifubot-tests-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import database
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A freshly migrated database in tmp_path, with every in-memory cache emptied."""
+    database.close_connections()
+    monkeypatch.setattr(database, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "waifubot.db"))
+    monkeypatch.setattr(database, "BACKUP_DIR", str(tmp_path / "backups"))
+    database.init_db()
+    database._reset_caches()
+    yield database
+    database.close_connections()
+
+@pytest.fixture
+def race():
+    return _race
+
+def _race(fn, args_per_thread):
+    """Runs fn(*args) on one thread per entry, all released at once; returns the results in order."""
+    barrier = threading.Barrier(len(args_per_thread))
+    results = [None] * len(args_per_thread)
+
+    def worker(i, args):
+        barrier.wait()
+        results[i] = fn(*args)
+
+    threads = [threading.Thread(target=worker, args=(i, args)) for i, args in enumerate(args_per_thread)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
@@ -0,0 +1,44 @@
+import asyncio
+
+from telegram.error import NetworkError, RetryAfter
+
+import broadcast
+
+class FakeBot:
+    """send_message raises the queued errors in order, then succeeds."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def send_message(self, chat_id, text):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+def _send(bot, **kwargs):
+    limiter = broadcast.RateLimiter(rate=1000, chat_interval=0)
+    job = broadcast.Broadcast(bot, 1, "hello", limiter=limiter, max_retries=3, **kwargs)
+    return asyncio.run(job._send(42)), job
+
+def test_rate_limits_do_not_use_up_network_attempts():
+    bot = FakeBot(*[RetryAfter(0)] * 5)
+    delivered, job = _send(bot)
+    assert delivered
+    assert bot.calls == 6
+    assert job.retries == 5
+
+def test_rate_limits_are_capped():
+    bot = FakeBot(*[RetryAfter(0)] * 5)
+    delivered, job = _send(bot, max_rate_limits=2)
+    assert not delivered
+    assert bot.calls == 3
+
+def test_network_errors_are_capped(monkeypatch):
+    async def no_sleep(seconds):
+        pass
+    monkeypatch.setattr(broadcast.asyncio, "sleep", no_sleep)
+    bot = FakeBot(*[NetworkError("boom")] * 5)
+    delivered, _ = _send(bot)
+    assert not delivered
+    assert bot.calls == 3
@@ -0,0 +1,32 @@
+from collections import Counter
+
+THREADS = 16
+GROUPS = 25
+
+def test_one_catcher_wins_each_spawn(db, race):
+    char_id = db.add_character("Rem", "Re:Zero", "💫 Rare", "https://example.com/rem.png", 1)
+    for group_id in range(-GROUPS, 0):
+        db.set_spawn(group_id, char_id, 1)
+
+    winners = {}
+    for group_id in range(-GROUPS, 0):
+        results = race(db.catch_character, [(group_id, user_id) for user_id in range(1, THREADS + 1)])
+        statuses = Counter(r["status"] for r in results)
+        assert statuses == {"caught": 1, "already_caught": THREADS - 1}
+        winner = next(user_id for user_id, r in enumerate(results, start=1) if r["status"] == "caught")
+        with db._conn() as con:
+            caught_by = con.execute("SELECT caught_by FROM active_spawns WHERE group_id=?", (group_id,)).fetchone()[0]
+        assert caught_by == winner
+        winners[winner] = winners.get(winner, 0) + 1
+
+    with db._conn() as con:
+        assert con.execute("SELECT COUNT(*) FROM collections").fetchone()[0] == GROUPS
+        catches = dict(con.execute("SELECT user_id, catches FROM users WHERE catches > 0").fetchall())
+    assert catches == winners
+
+def test_catch_after_catch_is_already_caught(db):
+    char_id = db.add_character("Emilia", "Re:Zero", "⭐ Common", "https://example.com/emilia.png", 1)
+    db.set_spawn(-1, char_id, 1)
+    assert db.catch_character(-1, 1)["status"] == "caught"
+    assert db.catch_character(-1, 2)["status"] == "already_caught"
+    assert db.catch_character(-2, 2)["status"] == "no_spawn"
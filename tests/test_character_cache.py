@@ -0,0 +1,29 @@
+import database
+
+def test_miss_survives_invalidate_during_fetch(db, monkeypatch):
+    char_id = db.add_character("Rem", "Re:Zero", "💫 Rare", "https://example.com/rem.png", 1)
+    db._characters.all()            # load the cache
+    with db._conn() as con:         # a row the cache hasn't seen yet
+        hidden = con.execute(
+            "INSERT INTO characters (name,anime,rarity,image_url) VALUES ('Ram','Re:Zero','💫 Rare','https://example.com/ram.png')"
+        ).lastrowid
+
+    fetch = database._fetch_character
+    def fetch_then_invalidate(char_id):
+        row = fetch(char_id)
+        db._characters.invalidate()
+        return row
+    monkeypatch.setattr(database, "_fetch_character", fetch_then_invalidate)
+
+    assert db.get_character(hidden)["name"] == "Ram"
+    monkeypatch.setattr(database, "_fetch_character", fetch)
+    assert db.get_character(hidden)["name"] == "Ram"
+    assert db.get_character(char_id)["name"] == "Rem"
+
+def test_delete_drops_cached_row(db):
+    char_id = db.add_character("Rem", "Re:Zero", "💫 Rare", "https://example.com/rem.png", 1)
+    assert db.get_character(char_id)["rarity"] == "💫 Rare"
+    assert [r["id"] for r in db.get_characters_by_rarity("💫 Rare")] == [char_id]
+    db.delete_character(char_id)
+    assert db.get_character(char_id) is None
+    assert not db.get_characters_by_rarity("💫 Rare")
@@ -0,0 +1,104 @@
+import asyncio
+import csv
+
+from aiohttp import web
+
+import async_db
+import character_import
+
+PNG = b"\x89PNG\r\n\x1a\n"
+
+async def _image(request):
+    return web.Response(body=PNG, content_type="image/png")
+
+async def _slow(request):
+    await asyncio.sleep(1)
+    return web.Response(body=PNG, content_type="image/png")
+
+async def _html(request):
+    return web.Response(text="<html></html>", content_type="text/html")
+
+async def _no_head(request):
+    if request.method == "HEAD":
+        raise web.HTTPMethodNotAllowed("HEAD", ["GET"])
+    return await _image(request)
+
+async def _serve(fn):
+    """Runs fn(base_url) with a local stand-in image host."""
+    app = web.Application()
+    app.router.add_route("*", "/ok/{name}", _image)
+    app.router.add_route("*", "/slow.png", _slow)
+    app.router.add_route("*", "/page.png", _html)
+    app.router.add_route("*", "/get-only.png", _no_head)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        return await fn(f"http://127.0.0.1:{port}")
+    finally:
+        await runner.cleanup()
+
+def _write_roster(path, base, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(character_import.FIELDS)
+        for name, rarity, url in rows:
+            writer.writerow((name, "Test", rarity, url.format(base=base)))
+
+def _import(tmp_path, rows, **kwargs):
+    roster, report = tmp_path / "roster.csv", tmp_path / "errors.csv"
+
+    async def run(base):
+        _write_roster(roster, base, rows)
+        return await character_import.import_characters(str(roster), report_path=str(report), **kwargs)
+
+    result = asyncio.run(_serve(run))
+    with open(report, newline="", encoding="utf-8") as f:
+        errors = {row["name"]: row["error"] for row in csv.DictReader(f)}
+    return result, errors
+
+def test_bad_urls_are_reported(db, tmp_path):
+    result, errors = _import(tmp_path, [
+        ("Good", "⭐ Common", "{base}/ok/good.png"),
+        ("Missing", "⭐ Common", "{base}/missing.png"),
+        ("Slow", "⭐ Common", "{base}/slow.png"),
+        ("Page", "⭐ Common", "{base}/page.png"),
+        ("GetOnly", "⭐ Common", "{base}/get-only.png"),
+        ("Ftp", "⭐ Common", "ftp://example.com/x.png"),
+    ], timeout=0.5)
+
+    assert result["rows"] == 6 and result["imported"] == 2 and result["errors"] == 4
+    assert errors["Missing"] == "image_url returned HTTP 404"
+    assert errors["Slow"] == "image_url timed out"
+    assert errors["Page"] == "image_url is text/html, not an image"
+    assert errors["Ftp"].startswith("image_url is not an http(s) URL")
+    assert sorted(r["name"] for r in db.get_all_characters()) == ["GetOnly", "Good"]
+
+def test_rarity_aliases(db, tmp_path):
+    result, errors = _import(tmp_path, [
+        ("Exact", "💫 Rare", "{base}/ok/1.png"),
+        ("Alias", "rare", "{base}/ok/2.png"),
+        ("Shouting", "LEGENDARY", "{base}/ok/3.png"),
+        ("Unknown", "mythic", "{base}/ok/4.png"),
+    ])
+    assert result["imported"] == 3
+    assert errors["Unknown"].startswith("unknown rarity 'mythic'")
+    assert {r["name"]: r["rarity"] for r in db.get_all_characters()} == {
+        "Exact": "💫 Rare", "Alias": "💫 Rare", "Shouting": "🌠 Legendary"}
+
+def test_rows_are_inserted_in_batches(db, tmp_path, monkeypatch):
+    batches = []
+    add_characters = async_db.add_characters
+
+    async def recording(rows):
+        batches.append(len(rows))
+        return await add_characters(rows)
+
+    monkeypatch.setattr(async_db, "add_characters", recording)
+    result, errors = _import(tmp_path, [(f"C{i}", "common", f"{{base}}/ok/{i}.png") for i in range(7)],
+                             batch_size=3)
+    assert result["imported"] == 7 and not errors
+    assert batches == [3, 3, 1]
+    assert len(db.get_all_characters()) == 7
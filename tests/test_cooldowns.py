@@ -0,0 +1,24 @@
+import database
+
+def _count_dirty(monkeypatch):
+    marks = []
+    monkeypatch.setattr(database, "_mark_dirty", lambda: marks.append(1))
+    return marks
+
+def test_daily_pays_once_per_cooldown(db, monkeypatch):
+    marks = _count_dirty(monkeypatch)
+    assert db.claim_daily(1, coins=100) == (True, 0)
+    claimed, left = db.claim_daily(1, coins=100)
+    assert not claimed and 0 < left <= db.config.DAILY_COOLDOWN_SEC
+    assert db.get_user(1)["coins"] == 100
+    assert len(marks) == 1
+
+def test_duel_cooldown_marks_the_change(db, monkeypatch):
+    marks = _count_dirty(monkeypatch)
+    assert db.start_duel_cooldown(1) == (True, 0)
+    claimed, left = db.start_duel_cooldown(1)
+    assert not claimed and 0 < left <= db.config.DUEL_COOLDOWN_SEC
+    assert db.get_user(1)["last_duel_at"] is not None
+    assert len(marks) == 1
+    assert db.start_duel_cooldown(1, cooldown=0) == (True, 0)
+    assert len(marks) == 2
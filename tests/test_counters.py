@@ -0,0 +1,49 @@
+import threading
+
+import database
+
+def test_deltas_for_one_user_are_merged(db):
+    db.ensure_users([(1, "alice", "Alice")])
+    before = db.counter_metrics()
+    futures = [db.queue_counters(1, coins=10, wins=1) for _ in range(5)]
+    futures.append(db.queue_counters(1, coins=-20, losses=2))
+    db.flush_counters()
+
+    assert all(f.result(timeout=5) is True for f in futures)
+    user = db.get_user(1)
+    assert (user["coins"], user["wins"], user["losses"]) == (30, 5, 2)
+    after = db.counter_metrics()
+    assert after["operations"] - before["operations"] == 6
+    assert after["rows_written"] - before["rows_written"] == 1
+    assert after["pending"] == 0
+
+def test_net_coins_are_clamped_at_zero(db):
+    db.ensure_users([(1, "alice", "Alice")])
+    db.queue_counters(1, coins=-50)
+    db.flush_counters()
+    assert db.get_user(1)["coins"] == 0
+
+def test_missing_user_is_created_not_dropped(db):
+    before = db.counter_metrics()["rows_written"]
+    future = db.queue_counters(999, coins=50, catches=1)
+    assert future.result(timeout=5) is True
+    user = db.get_user(999)
+    assert (user["coins"], user["catches"]) == (50, 1)
+    assert db.counter_metrics()["rows_written"] - before == 1
+
+def test_failed_batch_fails_every_future(db, monkeypatch):
+    def broken():
+        raise database.sqlite3.OperationalError("disk I/O error")
+    db.ensure_users([(1, "alice", "Alice")])
+    monkeypatch.setattr(database, "_conn", broken)
+    futures = [db.queue_counters(1, coins=1), db.queue_counters(2, wins=1)]
+    db.flush_counters()
+    for future in futures:
+        assert isinstance(future.exception(timeout=5), database.sqlite3.OperationalError)
+
+def test_background_writer_flushes_on_its_own(db):
+    db.ensure_users([(1, "alice", "Alice")])
+    done = threading.Event()
+    db.queue_counters(1, coins=5).add_done_callback(lambda f: done.set())
+    assert done.wait(timeout=5)
+    assert db.get_user(1)["coins"] == 5
@@ -0,0 +1,16 @@
+import config
+
+def test_page_cache_is_bounded(db, monkeypatch):
+    monkeypatch.setattr(config, "LEADERBOARD_CACHE_MAX", 8)
+    db.ensure_users([(i, f"user{i}", "") for i in range(1, 51)])
+    for page in range(40):
+        db.get_leaderboard_page("coins", page=page, per_page=1)
+    assert len(db._leaderboard_cache) == 8
+    assert ("coins", 39, 1) in db._leaderboard_cache
+
+def test_expired_pages_are_pruned(db, monkeypatch):
+    monkeypatch.setattr(config, "LEADERBOARD_CACHE_SEC", 0)
+    db.ensure_users([(1, "alice", "Alice")])
+    for page in range(20):
+        db.get_leaderboard_page("wins", page=page)
+    assert len(db._leaderboard_cache) == 1
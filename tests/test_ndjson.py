@@ -0,0 +1,35 @@
+def test_import_keeps_dumped_daily_stats(db, tmp_path):
+    db.ensure_users([(i, f"user{i}", "") for i in range(1, 4)])
+    with db._conn() as con:
+        con.execute("DELETE FROM stats_daily")
+        con.execute("INSERT INTO stats_daily (day, catches, new_users) VALUES ('2024-01-01', 5, 3)")
+    dump = str(tmp_path / "dump.ndjson.gz")
+    counts = db.export_ndjson(dump)
+    assert counts["users"] == 3
+
+    with db._conn() as con:
+        con.execute("DELETE FROM users")
+        con.execute("DELETE FROM stats_daily")
+        con.execute("INSERT INTO stats_daily (day, catches, new_users) VALUES ('2023-12-31', 1, 1)")
+    db.import_ndjson(dump)
+
+    assert [tuple(r) for r in db.get_daily_stats(30)] == [("2024-01-01", 5, 3), ("2023-12-31", 1, 1)]
+    assert db.get_stats()["total_users"] == 3
+
+def _fts_integrity_check(db):
+    with db._conn() as con:
+        for table in ["characters_fts"] + (["characters_trgm"] if db._has_trigram_index(con) else []):
+            con.execute(f"INSERT INTO {table}({table}, rank) VALUES ('integrity-check', 1)")
+
+def test_import_over_existing_rows_keeps_search_in_sync(db, tmp_path):
+    char_id = db.add_character("Rem", "Re:Zero", "💫 Rare", "https://example.com/rem.png", 1)
+    dump = str(tmp_path / "dump.ndjson")
+    db.export_ndjson(dump)
+    db.update_character(char_id, name="Ram")
+    assert [r["id"] for r in db.search_characters("Ram", fuzzy=False)] == [char_id]
+
+    assert db.import_ndjson(dump)["characters"] == 1
+    _fts_integrity_check(db)
+    assert db.search_characters("Ram", fuzzy=False) == []
+    assert [r["name"] for r in db.search_characters("Rem", fuzzy=False)] == ["Rem"]
+    assert db.get_character(char_id)["name"] == "Rem"
@@ -0,0 +1,9 @@
+def test_no_full_table_scans(db):
+    assert db.audit_query_plans() == []
+
+def test_f_string_queries_are_checked(db):
+    with db._conn() as con:
+        con.execute("DROP INDEX idx_users_coins")
+    problems = {(name, detail) for name, sql, detail in db.audit_query_plans()}
+    assert ("get_leaderboard_page", "SCAN users") in problems
+    assert ("get_user_rank", "SCAN users") in problems
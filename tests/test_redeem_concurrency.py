@@ -0,0 +1,44 @@
+import sqlite3
+from collections import Counter
+
+import pytest
+
+THREADS = 32
+
+def test_max_uses_is_never_exceeded(db, race):
+    assert db.create_redeem_code("RACE", coins=100, max_uses=5)
+    results = race(db.redeem_code, [("RACE", user_id) for user_id in range(1, THREADS + 1)])
+    assert Counter(r["status"] for r in results) == {"redeemed": 5, "exhausted": THREADS - 5}
+
+    row = db.get_redeem_code("RACE")
+    assert row["used_count"] == row["max_uses"] == 5
+    with db._conn() as con:
+        assert con.execute("SELECT COUNT(*) FROM redeem_log WHERE code='RACE'").fetchone()[0] == 5
+        assert con.execute("SELECT SUM(coins) FROM users").fetchone()[0] == 5 * 100
+
+def test_same_user_redeems_once(db, race):
+    assert db.create_redeem_code("TWICE", coins=50, max_uses=100)
+    results = race(db.redeem_code, [("TWICE", 7)] * THREADS)
+    assert Counter(r["status"] for r in results) == {"redeemed": 1, "already_redeemed": THREADS - 1}
+    assert db.get_redeem_code("TWICE")["used_count"] == 1
+    assert db.get_user(7)["coins"] == 50
+
+def test_expired_and_unknown_codes(db):
+    assert db.create_redeem_code("OLD", coins=10, expires_in=-5)
+    assert db.redeem_code("OLD", 1)["status"] == "expired"
+    assert db.redeem_code("NOPE", 1)["status"] == "not_found"
+    assert db.get_redeem_code("OLD")["used_count"] == 0
+
+def test_generate_codes_validates_count(db):
+    codes = db.generate_redeem_codes(500, coins=5)
+    assert len(set(codes)) == 500
+    assert db.generate_redeem_codes(0) == []
+    with pytest.raises(ValueError):
+        db.generate_redeem_codes(33, length=1)
+    with pytest.raises(ValueError):
+        db.generate_redeem_codes(-1)
+
+def test_generate_codes_gives_up_when_space_is_full(db):
+    assert len(db.generate_redeem_codes(32, length=1)) == 32
+    with pytest.raises(sqlite3.IntegrityError):
+        db.generate_redeem_codes(1, length=1)
@@ -0,0 +1,35 @@
+import os
+
+def test_list_snapshots_ignores_partial_files(db):
+    path = db.snapshot_now()
+    assert path.endswith(db.SNAPSHOT_SUFFIXES)
+    partial = os.path.join(db.BACKUP_DIR, "waifubot-99999999-999999.db.gz.part")
+    with open(partial, "wb") as f:
+        f.write(b"half a snapshot")
+
+    assert db.list_snapshots() == [path]
+    db._rotate_snapshots(0)
+    assert os.path.exists(partial)
+    assert db.list_snapshots() == []
+
+def test_restore_round_trip(db):
+    db.ensure_users([(1, "alice", "Alice")])
+    path = db.snapshot_now()
+    db.update_coins(1, 500)
+    db.restore_snapshot(path)
+    assert db.get_user(1)["coins"] == 0
+
+def test_snapshots_are_time_based_only(db, monkeypatch):
+    import time
+    taken = []
+    monkeypatch.setattr(db, "_write_snapshot", lambda: taken.append(1) or ("x.db.gz", {"bytes": 0, "raw_bytes": 0, "restarts": 0}))
+    writer = db._BackupWriter(interval=0.3)
+    for _ in range(20_000):
+        writer.mark_dirty()
+    time.sleep(0.1)
+    assert taken == []
+    deadline = time.monotonic() + 5
+    while not taken and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert taken == [1]
+    assert writer.metrics()["pending"] == 0
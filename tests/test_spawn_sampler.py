@@ -0,0 +1,51 @@
+import random
+from collections import Counter
+
+import config
+
+PICKS = 100_000
+CHI2_CRITICAL = {3: 16.27, 4: 18.47}    # p = 0.001
+
+def _add(db, rarity, count):
+    for i in range(count):
+        db.add_character(f"{rarity} {i}", "Test", rarity, f"https://example.com/{i}.png", 1)
+
+def _chi2(observed, weights, picks):
+    total = sum(weights.values())
+    return sum((observed.get(r, 0) - picks * w / total) ** 2 / (picks * w / total) for r, w in weights.items())
+
+def test_empty_roster_picks_nothing(db):
+    assert db.pick_spawn_character(random.Random(1)) is None
+
+def test_frequencies_follow_rarity_weights(db):
+    for rarity in config.RARITY_WEIGHTS:
+        _add(db, rarity, 3)
+    rng = random.Random(20240101)
+    picks = Counter(db.pick_spawn_character(rng)["rarity"] for _ in range(PICKS))
+    assert _chi2(picks, config.RARITY_WEIGHTS, PICKS) < CHI2_CRITICAL[len(config.RARITY_WEIGHTS) - 1]
+
+def test_empty_rarities_are_skipped(db):
+    empty = "🌠 Legendary"
+    for rarity in config.RARITY_WEIGHTS:
+        if rarity != empty:
+            _add(db, rarity, 2)
+    rng = random.Random(7)
+    picks = Counter(db.pick_spawn_character(rng)["rarity"] for _ in range(PICKS))
+    assert empty not in picks
+    weights = {r: w for r, w in config.RARITY_WEIGHTS.items() if r != empty}
+    assert _chi2(picks, weights, PICKS) < CHI2_CRITICAL[len(weights) - 1]
+
+    # Adding a character brings the rarity back without a full reload
+    _add(db, empty, 1)
+    assert any(db.pick_spawn_character(rng)["rarity"] == empty for _ in range(PICKS // 10))
+
+def test_characters_within_a_rarity_are_uniform(db):
+    _add(db, "💫 Rare", 4)
+    rng = random.Random(99)
+    picks = Counter(db.pick_spawn_character(rng)["name"] for _ in range(PICKS))
+    assert len(picks) == 4
+    assert _chi2(picks, dict.fromkeys(picks, 1), PICKS) < CHI2_CRITICAL[3]
+
+def test_custom_characters_never_spawn(db):
+    db.add_character("Mine", "Test", "⭐ Common", "https://example.com/m.png", 1, is_custom=1, owner_id=1)
+    assert db.pick_spawn_character(random.Random(3)) is None
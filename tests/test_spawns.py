@@ -0,0 +1,171 @@
+import random
+
+import pytest
+
+import spawns
+from spawns import SpawnRegistry, SpawnScheduler, TimerWheel
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+# ── Timer Wheel ───────────────────────────────────────────────────────────
+def test_wheel_expires_in_deadline_order_across_wrap_around():
+    wheel = TimerWheel(tick=1.0, slots=8, now=0)
+    wheel.schedule("a", 3.5)
+    wheel.schedule("b", 11.2)       # same slot as 3 after one revolution
+    wheel.schedule("c", 30.0)       # several revolutions out
+    assert wheel.advance(3.0) == []
+    assert wheel.advance(4.0) == ["a"]
+    assert wheel.advance(11.0) == []
+    assert wheel.advance(11.2) == ["b"]
+    assert len(wheel) == 1
+    assert wheel.advance(100.0) == ["c"]    # jump further than a whole revolution
+    assert len(wheel) == 0
+
+def test_wheel_cancel_and_reschedule():
+    wheel = TimerWheel(tick=1.0, slots=8, now=0)
+    wheel.schedule("a", 2.0)
+    wheel.schedule("b", 2.0)
+    wheel.cancel("a")
+    wheel.schedule("b", 5.0)        # rescheduling moves the key
+    assert wheel.advance(4.0) == []
+    assert wheel.advance(5.0) == ["b"]
+    wheel.cancel("missing")
+
+def test_wheel_past_deadline_fires_on_next_advance():
+    wheel = TimerWheel(tick=1.0, slots=8, now=10)
+    wheel.schedule("late", 3.0)
+    assert wheel.advance(10.0) == ["late"]
+
+def test_wheel_matches_a_sorted_reference():
+    rng = random.Random(5)
+    wheel = TimerWheel(tick=0.5, slots=16, now=0)
+    pending, now = {}, 0.0
+    for step in range(3000):
+        key = rng.randrange(200)
+        if rng.random() < 0.2:
+            wheel.cancel(key)
+            pending.pop(key, None)
+        else:
+            deadline = now + rng.uniform(-1, 40)
+            wheel.schedule(key, deadline)
+            pending[key] = deadline
+        if step % 7 == 0:
+            now += rng.uniform(0, 6)
+            due = sorted(k for k, d in pending.items() if d <= now)
+            assert sorted(wheel.advance(now)) == due
+            for k in due:
+                del pending[k]
+    assert len(wheel) == len(pending)
+
+# ── Registry ──────────────────────────────────────────────────────────────
+def test_reserve_starts_the_cooldown():
+    clock = Clock()
+    registry = SpawnRegistry(catch_window=60, cooldown=120, clock=clock)
+    assert registry.reserve(-1)
+    assert not registry.reserve(-1)
+    assert registry.reserve(-2)
+    clock.now += 120
+    assert registry.reserve(-1)
+
+def test_check_catch_statuses():
+    clock = Clock()
+    registry = SpawnRegistry(catch_window=60, cooldown=120, clock=clock)
+    assert registry.check_catch(-1) == "no_spawn"
+    registry.add(-1, 7, 100)
+    assert registry.check_catch(-1) is None
+    assert registry.get(-1).char_id == 7
+    registry.mark_caught(-1, 42)
+    assert registry.check_catch(-1) == "already_caught"
+    assert registry.get(-1) is None
+
+    registry.add(-2, 8, 101)
+    clock.now += 61
+    assert registry.check_catch(-2) == "expired"
+    assert not registry.can_spawn(-2)       # cooldown outlasts the catch window
+
+def test_expire_due_drops_closed_spawns_and_cooldowns():
+    clock = Clock()
+    registry = SpawnRegistry(catch_window=60, cooldown=120, clock=clock)
+    registry.add(-1, 7, 100)
+    registry.add(-2, 8, 101)
+    registry.mark_caught(-2, 42)
+    clock.now += 30
+    registry.remove(-2)
+    clock.now += 31
+    assert [s.group_id for s in registry.expire_due()] == [-1]
+    assert len(registry) == 0
+    assert not registry.can_spawn(-1)
+    clock.now += 60
+    registry.expire_due()
+    assert registry._next_spawn == {}
+    assert registry.can_spawn(-1)
+
+def test_recover_rebuilds_the_registry_from_the_journal(db, monkeypatch):
+    clock = Clock(spawns.time.time())
+    registry = SpawnRegistry(catch_window=60, cooldown=120, clock=clock)
+    monkeypatch.setattr(spawns, "registry", registry)
+    char_id = db.add_character("Rem", "Re:Zero", "💫 Rare", "https://example.com/rem.png", 1)
+    db.set_spawn(-1, char_id, 100)
+    db.set_spawn(-2, char_id, 101)
+    db.mark_caught(-2, 42)
+
+    assert spawns.recover() == 2
+    assert registry.check_catch(-1) is None
+    assert registry.get(-1).message_id == 100
+    assert registry.check_catch(-2) == "already_caught"
+    assert not registry.can_spawn(-1)
+    clock.now += 61
+    assert {s.group_id for s in registry.expire_due()} == {-1, -2}
+
+# ── Scheduler ─────────────────────────────────────────────────────────────
+def test_every_eligible_message_spawns_at_chance_one():
+    clock = Clock()
+    registry = SpawnRegistry(catch_window=60, cooldown=120, clock=clock)
+    scheduler = SpawnScheduler(registry, chance=1.0)
+    assert scheduler.on_message(-1, 1)
+    registry.add(-1, 7, 100)
+    assert not scheduler.on_message(-1, 1)      # live spawn
+    clock.now += 61
+    assert not scheduler.on_message(-1, 1)      # cooldown
+    clock.now += 60
+    assert scheduler.on_message(-1, 1)
+    assert (scheduler.messages, scheduler.spawns) == (4, 2)
+
+def test_no_spawns_at_chance_zero():
+    registry = SpawnRegistry(catch_window=0, cooldown=0, clock=Clock())
+    scheduler = SpawnScheduler(registry, chance=0.0)
+    assert not any(scheduler.on_message(-1, 1) for _ in range(1000))
+
+def test_spawn_rate_matches_chance():
+    clock = Clock()
+    registry = SpawnRegistry(catch_window=0, cooldown=0, clock=clock)
+    scheduler = SpawnScheduler(registry, chance=0.05, rng=random.Random(11))
+    for i in range(100_000):
+        clock.now += 0.01
+        scheduler.on_message(-(i % 50) - 1, i % 300)
+    assert scheduler.spawns / scheduler.messages == pytest.approx(0.05, abs=0.004)
+
+def test_messages_during_cooldown_do_not_count():
+    clock = Clock()
+    registry = SpawnRegistry(catch_window=0, cooldown=100, clock=clock)
+    scheduler = SpawnScheduler(registry, chance=0.5, rng=random.Random(3))
+    while not scheduler.on_message(-1, 1):
+        clock.now += 1
+    remaining = dict(scheduler._remaining)
+    for _ in range(50):
+        clock.now += 1
+        assert not scheduler.on_message(-1, 1)
+    assert scheduler._remaining == remaining
+
+def test_pending_users_are_deduplicated():
+    scheduler = SpawnScheduler(SpawnRegistry(clock=Clock()), chance=0.0)
+    scheduler.on_message(-1, 1, "alice", "Alice")
+    scheduler.on_message(-2, 2, "bob", "Bob")
+    scheduler.on_message(-1, 1, "alice2", "Alice")
+    assert sorted(scheduler.take_pending_users()) == [(1, "alice2", "Alice"), (2, "bob", "Bob")]
+    assert scheduler.take_pending_users() == []